@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+'''
+Build the SQL database from dictionary-encoded rows (see VegasEncode.py):
+- The tag and node/way/relation tables hold integer codes for keys, values
+  and users (nodes_enc, nodes_tags_enc, ways_enc, ways_tags_enc,
+  relations_enc, relations_tags_enc)
+- The strings are stored once, in the tag_keys, tag_values and users tables
+- Views named nodes, nodes_tags, ways, ways_tags, relations and
+  relations_tags join the codes back to the strings, so the queries in
+  SQLquery.py run unchanged (the joins make them a little slower than on
+  the plain tables)
+- QUERIES has the SQLquery.py queries written against the codes: each
+  string is looked up once, then the filters, joins and GROUP BYs run on
+  integers and only the final rows are decoded
+
+load_map_encoded() loads straight from the OSM file, import_encoded_csv()
+loads the .csv files written by VegasData.process_map(encoded=True).
+'''
+
+import os
+
+import VegasData
+import VegasEncode
+from SQLspatial import create_spatial_index
+from SQLload import (SQL_DB, BATCH_SIZE, TableBatches, drop_objects,
+                     import_csv, index_name, open_bulk)
+from VegasData import WAY_NODES_FIELDS, RELATION_MEMBERS_FIELDS
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'SQLschema_encoded.sql')
+
+# Table name -> column order, matching the encoded .csv files
+TABLES = [('tag_keys', VegasEncode.TAG_KEYS_FIELDS),
+          ('tag_values', VegasEncode.TAG_VALUES_FIELDS),
+          ('users', VegasEncode.USERS_FIELDS),
+          ('nodes_enc', VegasEncode.NODE_FIELDS),
+          ('nodes_tags_enc', VegasEncode.NODE_TAGS_FIELDS),
+          ('ways_enc', VegasEncode.WAY_FIELDS),
+          ('ways_tags_enc', VegasEncode.WAY_TAGS_FIELDS),
+          ('ways_nodes', WAY_NODES_FIELDS),
+          ('relations_enc', VegasEncode.RELATION_FIELDS),
+          ('relations_tags_enc', VegasEncode.RELATION_TAGS_FIELDS),
+          ('relations_members', RELATION_MEMBERS_FIELDS)]
+
+VIEWS = ['nodes', 'nodes_tags', 'ways', 'ways_tags', 'relations', 'relations_tags']
+
+# Table -> .csv file written by VegasData.process_map(encoded=True), and the
+# text columns to decode on import
+CSV_FILES = [('tag_keys', VegasData.LOOKUP_PATHS['tag_keys'], ['key']),
+             ('tag_values', VegasData.LOOKUP_PATHS['tag_values'], ['value']),
+             ('users', VegasData.LOOKUP_PATHS['users'], ['user']),
+             ('nodes_enc', VegasData.ENCODED_NODES_PATH, []),
+             ('nodes_tags_enc', VegasData.ENCODED_NODE_TAGS_PATH, []),
+             ('ways_enc', VegasData.ENCODED_WAYS_PATH, []),
+             ('ways_tags_enc', VegasData.ENCODED_WAY_TAGS_PATH, []),
+             ('ways_nodes', VegasData.WAY_NODES_PATH, []),
+             ('relations_enc', VegasData.ENCODED_RELATIONS_PATH, []),
+             ('relations_tags_enc', VegasData.ENCODED_RELATION_TAGS_PATH, []),
+             ('relations_members', VegasData.RELATION_MEMBERS_PATH, ['role'])]
+
+# Same indexes as SQLload.INDEXES, on the codes. The lookup indexes turn a
+# string filter on a view into a code.
+INDEXES = [('tag_keys', ('key',)),
+           ('tag_values', ('value',)),
+           ('users', ('user',)),
+           ('nodes_tags_enc', ('key_id', 'value_id', 'id')),
+           ('nodes_tags_enc', ('value_id', 'key_id', 'id')),
+           ('nodes_tags_enc', ('id',)),
+           ('ways_tags_enc', ('key_id', 'value_id', 'id')),
+           ('ways_tags_enc', ('value_id', 'key_id', 'id')),
+           ('ways_tags_enc', ('id',)),
+           ('ways_nodes', ('id',)),
+           ('ways_nodes', ('node_id',)),
+           ('relations_tags_enc', ('key_id', 'value_id', 'id')),
+           ('relations_tags_enc', ('id',)),
+           ('relations_members', ('id',)),
+           ('relations_members', ('member_type', 'member_id'))]
+
+
+# The SQLquery.py queries on the encoded tables, same results
+QUERIES = [
+    ('cafe_count', '''SELECT COUNT(*) FROM nodes_tags_enc
+                      WHERE value_id IN (SELECT id FROM tag_values
+                                         WHERE value IN ('cafe', 'coffee_shop'))'''),
+    ('religion', '''SELECT tag_values.value, num
+                    FROM (SELECT t.value_id, COUNT(*) as num
+                          FROM nodes_tags_enc t JOIN
+                          (SELECT DISTINCT(id) FROM nodes_tags_enc
+                           WHERE value_id = (SELECT id FROM tag_values
+                                             WHERE value = 'place_of_worship')) pow
+                          ON t.id = pow.id
+                          WHERE t.key_id = (SELECT id FROM tag_keys WHERE key = 'religion')
+                          GROUP BY t.value_id
+                          ORDER BY num DESC
+                          LIMIT 1) top
+                    JOIN tag_values ON tag_values.id = top.value_id'''),
+    ('schools', '''SELECT COUNT(*) as NUM FROM nodes_tags_enc
+                   WHERE value_id IN (SELECT id FROM tag_values
+                                      WHERE value IN ('school', 'college',
+                                                      'kindergarden', 'university'))'''),
+    ('casinos', '''SELECT COUNT(*) as NUM FROM ways_tags_enc
+                   WHERE value_id IN (SELECT id FROM tag_values
+                                      WHERE value IN ('casino', 'adult_gaming_centre',
+                                                      'amusement_arcade', 'gambling'))'''),
+    ('top_users', '''SELECT users.user, num
+                     FROM (SELECT user_id, COUNT(*) as num
+                           FROM (SELECT user_id FROM nodes_enc UNION ALL
+                                 SELECT user_id FROM ways_enc)
+                           GROUP BY user_id
+                           ORDER BY num DESC
+                           LIMIT 10) top
+                     JOIN users ON users.id = top.user_id
+                     ORDER BY num DESC'''),
+]
+
+
+def create_tables(conn):
+    """Drop old tables/views and create empty ones from SQLschema_encoded.sql"""
+    drop_objects(conn, VIEWS + [table for table, _ in TABLES])
+    with open(SCHEMA_PATH) as f:
+        conn.executescript(f.read())
+
+
+def create_indexes(conn):
+    """Build the secondary indexes and refresh the query planner statistics"""
+    for table, columns in INDEXES:
+        conn.execute('CREATE INDEX IF NOT EXISTS {0} ON {1} ({2})'.format(
+            index_name(table, columns), table, ', '.join(columns)))
+    conn.execute('ANALYZE')
+    conn.commit()
+
+
+def load_map_encoded(file_in, db_path=SQL_DB, batch_size=BATCH_SIZE, index=True):
+    """Shape, encode and insert each XML element into the SQL DB, return row counts"""
+    conn = open_bulk(db_path)
+    create_tables(conn)
+    batches = TableBatches(conn, TABLES, batch_size)
+    encoder = VegasEncode.Encoder()
+
+    try:
+        conn.execute('BEGIN')
+        for element in VegasData.get_element(file_in, tags=('node', 'way', 'relation')):
+            row, tags, way_nodes = VegasData.shape_rows(element)
+            if element.tag == 'node':
+                batches.add('nodes_enc', [encoder.node(row)])
+                batches.add('nodes_tags_enc', encoder.tags(tags))
+            elif element.tag == 'way':
+                batches.add('ways_enc', [encoder.way(row)])
+                batches.add('ways_nodes', way_nodes)
+                batches.add('ways_tags_enc', encoder.tags(tags))
+            else:
+                batches.add('relations_enc', [encoder.relation(row)])
+                batches.add('relations_members', way_nodes)
+                batches.add('relations_tags_enc', encoder.tags(tags))
+
+        for table, _, rows in encoder.lookups():
+            batches.add(table, rows)
+        batches.flush_all()
+        conn.execute('COMMIT')
+
+        if index:
+            create_indexes(conn)
+            create_spatial_index(conn)
+    finally:
+        conn.close()
+
+    return batches.counts
+
+
+def import_encoded_csv(conn, resume=False):
+    """Stream the encoded .csv files into a DB created by create_tables()"""
+    fields = dict(TABLES)
+    for table, csv_path, decode in CSV_FILES:
+        import_csv(conn, csv_path, table, fields[table], decode=decode, resume=resume)
+
+
+if __name__ == '__main__':
+    print load_map_encoded(VegasData.OSM_PATH)
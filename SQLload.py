@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+'''
+Load the OSM file straight into the SQL database, without the .csv files:
+- Shape each element with VegasData.shape_rows()
+- Collect rows per table and insert them with executemany in fixed size
+  batches, so memory stays bounded however big a table gets
+- Run the whole load in one transaction with pragmas tuned for bulk loading
+- Build the indexes only once the tables are full, then ANALYZE them
+- Fill the node/way R*Trees of SQLspatial.py from the loaded tables
+
+import_csv() is the .csv counterpart used by SQLquery.py: it streams a .csv
+file into a table in committed batches and can resume after an interruption.
+'''
+
+import csv
+import itertools
+import os
+import sqlite3
+import time
+
+import VegasData
+from SQLspatial import create_spatial_index
+from VegasData import (NODE_FIELDS, NODE_TAGS_FIELDS, WAY_FIELDS,
+                       WAY_TAGS_FIELDS, WAY_NODES_FIELDS, RELATION_FIELDS,
+                       RELATION_TAGS_FIELDS, RELATION_MEMBERS_FIELDS)
+
+# Name of SQL DB
+SQL_DB = 'sqldb.db'
+
+# Table creation code shared with SQLquery.py
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'SQLschema.sql')
+
+# Table name -> column order, matching the .csv files
+TABLES = [('nodes', NODE_FIELDS),
+          ('nodes_tags', NODE_TAGS_FIELDS),
+          ('ways', WAY_FIELDS),
+          ('ways_tags', WAY_TAGS_FIELDS),
+          ('ways_nodes', WAY_NODES_FIELDS),
+          ('relations', RELATION_FIELDS),
+          ('relations_tags', RELATION_TAGS_FIELDS),
+          ('relations_members', RELATION_MEMBERS_FIELDS)]
+
+# Rows held per table before they are inserted
+BATCH_SIZE = 50000
+
+# Bulk load settings. The database is rebuilt from the OSM file if a load
+# is interrupted, so there is no need for a rollback journal or fsyncs.
+PRAGMAS = ['PRAGMA journal_mode = OFF',
+           'PRAGMA synchronous = OFF',
+           'PRAGMA cache_size = -262144',  # 256 MB
+           'PRAGMA temp_store = MEMORY',
+           'PRAGMA locking_mode = EXCLUSIVE']
+
+
+# Secondary indexes, built after the bulk load (one sort per index instead of
+# a b-tree update per row). The tag indexes end in id so the lookups and
+# joins in SQLquery.py are answered from the index alone.
+INDEXES = [('nodes_tags', ('key', 'value', 'id')),
+           ('nodes_tags', ('value', 'id')),
+           ('nodes_tags', ('id',)),
+           ('ways_tags', ('key', 'value', 'id')),
+           ('ways_tags', ('value', 'id')),
+           ('ways_tags', ('id',)),
+           ('ways_nodes', ('id',)),
+           ('ways_nodes', ('node_id',)),
+           ('relations_tags', ('key', 'value', 'id')),
+           ('relations_tags', ('id',)),
+           ('relations_members', ('id',)),
+           ('relations_members', ('member_type', 'member_id'))]
+
+
+def insert_sql(table, fields):
+    return 'INSERT INTO {0} ({1}) VALUES ({2});'.format(
+        table, ', '.join(fields), ', '.join('?' * len(fields)))
+
+
+def drop_objects(conn, names):
+    """Drop each table or view in names that exists"""
+    for name in names:
+        row = conn.execute('SELECT type FROM sqlite_master WHERE name = ?',
+                           (name,)).fetchone()
+        if row is not None:
+            conn.execute('DROP {0} {1}'.format(row[0].upper(), name))
+
+
+def create_tables(conn):
+    """Drop old tables and create empty ones from SQLschema.sql"""
+    drop_objects(conn, [table for table, _ in TABLES])
+    with open(SCHEMA_PATH) as f:
+        conn.executescript(f.read())
+
+
+def index_name(table, columns):
+    return '{0}_{1}_idx'.format(table, '_'.join(columns))
+
+
+def drop_indexes(conn):
+    """Drop the secondary indexes, e.g. before appending a lot of rows"""
+    for table, columns in INDEXES:
+        conn.execute('DROP INDEX IF EXISTS {0}'.format(index_name(table, columns)))
+
+
+def create_indexes(conn):
+    """Build the secondary indexes and refresh the query planner statistics"""
+    for table, columns in INDEXES:
+        conn.execute('CREATE INDEX IF NOT EXISTS {0} ON {1} ({2})'.format(
+            index_name(table, columns), table, ', '.join(columns)))
+    conn.execute('ANALYZE')
+    conn.commit()
+
+
+def foreign_key_violations(conn):
+    """Return the rows breaking the FOREIGN KEY constraints in SQLschema.sql
+
+    sqlite does not enforce them during the load, so check afterwards.
+    Samples of the map will have ways pointing at nodes that aren't loaded.
+    """
+    return conn.execute('PRAGMA foreign_key_check').fetchall()
+
+
+class TableBatches(object):
+    """Collect rows per table and insert them with executemany in batches"""
+
+    def __init__(self, conn, tables, batch_size=BATCH_SIZE):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.inserts = dict((table, insert_sql(table, fields)) for table, fields in tables)
+        self.batches = dict((table, []) for table, _ in tables)
+        self.counts = dict((table, 0) for table, _ in tables)
+
+    def flush(self, table):
+        self.conn.executemany(self.inserts[table], self.batches[table])
+        self.counts[table] += len(self.batches[table])
+        self.batches[table] = []
+
+    def add(self, table, rows):
+        """Queue rows (a list, or a generator such as relation members)"""
+        batch = self.batches[table]
+        batch.extend(rows)
+        if len(batch) >= self.batch_size:
+            self.flush(table)
+
+    def flush_all(self):
+        for table in self.batches:
+            self.flush(table)
+
+
+def open_bulk(db_path):
+    """Connect to db_path for a bulk load, transactions handled by the caller"""
+    conn = sqlite3.connect(db_path)
+    # shape_rows() values are utf-8 encoded already, store them as they are
+    conn.text_factory = str
+    # Transactions are handled by the caller, not by the sqlite3 module
+    conn.isolation_level = None
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def load_map(file_in, db_path=SQL_DB, batch_size=BATCH_SIZE, index=True):
+    """Shape each XML element and insert it into the SQL DB, return row counts
+
+    The tables are created without indexes; with index=True the indexes are
+    built (and ANALYZE run) once every row is in, along with the spatial index.
+    """
+    conn = open_bulk(db_path)
+    create_tables(conn)
+    batches = TableBatches(conn, TABLES, batch_size)
+
+    try:
+        conn.execute('BEGIN')
+        for element in VegasData.get_element(file_in, tags=('node', 'way', 'relation')):
+            row, tags, way_nodes = VegasData.shape_rows(element)
+            if element.tag == 'node':
+                batches.add('nodes', [row])
+                batches.add('nodes_tags', tags)
+            elif element.tag == 'way':
+                batches.add('ways', [row])
+                batches.add('ways_nodes', way_nodes)
+                batches.add('ways_tags', tags)
+            else:
+                batches.add('relations', [row])
+                batches.add('relations_members', way_nodes)
+                batches.add('relations_tags', tags)
+
+        batches.flush_all()
+        conn.execute('COMMIT')
+
+        if index:
+            create_indexes(conn)
+            create_spatial_index(conn)
+    finally:
+        conn.close()
+
+    return batches.counts
+
+
+# ================================================== #
+#               CSV Import                           #
+# ================================================== #
+
+# Rows per committed batch when importing .csv files
+CSV_BATCH_SIZE = 100000
+
+# Rows committed so far per table, kept in the DB so an import can resume
+PROGRESS_TABLE = 'import_progress'
+
+
+def csv_rows(csv_path, columns, decode=()):
+    """Yield a tuple of columns for each row of a .csv file
+
+    Columns named in decode are decoded from utf-8 to unicode.
+    """
+    with open(csv_path, 'rb') as f:
+        for row in csv.DictReader(f):
+            yield tuple([row[c].decode('utf-8') if c in decode else row[c]
+                         for c in columns])
+
+
+def print_progress(table, rows, rate):
+    print '{0}: {1} rows, {2:.0f} rows/s'.format(table, rows, rate)
+
+
+def committed_rows(conn, table):
+    """Return how many rows of table an earlier import committed"""
+    conn.execute('''CREATE TABLE IF NOT EXISTS {0} (
+        name TEXT PRIMARY KEY NOT NULL,
+        rows INTEGER NOT NULL
+    )'''.format(PROGRESS_TABLE))
+    row = conn.execute('SELECT rows FROM {0} WHERE name = ?'.format(PROGRESS_TABLE),
+                       (table,)).fetchone()
+    return row[0] if row else 0
+
+
+def import_rows(conn, table, columns, rows, batch_size=CSV_BATCH_SIZE,
+                resume=False, report=print_progress):
+    """Insert rows (any iterable of tuples) into table in committed batches
+
+    Only one batch is held in memory at a time. Each batch is committed
+    together with the running row count, so with resume=True the rows an
+    interrupted import already committed are skipped. Returns the number of
+    rows in the table once done.
+    """
+    done = committed_rows(conn, table) if resume else 0
+    rows = iter(rows)
+    if done:
+        next(itertools.islice(rows, done, done), None)
+
+    sql = insert_sql(table, columns)
+    progress_sql = 'INSERT OR REPLACE INTO {0} (name, rows) VALUES (?, ?)'.format(
+        PROGRESS_TABLE)
+    if not resume:
+        committed_rows(conn, table)
+        conn.execute(progress_sql, (table, 0))
+        conn.commit()
+
+    start = time.time()
+    imported = 0
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        conn.executemany(sql, batch)
+        imported += len(batch)
+        conn.execute(progress_sql, (table, done + imported))
+        conn.commit()
+        if report is not None:
+            report(table, done + imported, imported / max(time.time() - start, 1e-6))
+
+    return done + imported
+
+
+def import_csv(conn, csv_path, table, columns, decode=(), **kwargs):
+    """Stream a .csv file into table with import_rows()"""
+    return import_rows(conn, table, columns, csv_rows(csv_path, columns, decode),
+                       **kwargs)
+
+
+if __name__ == '__main__':
+    print load_map(VegasData.OSM_PATH)
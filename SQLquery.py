@@ -6,11 +6,16 @@ By: Kyle Campbell
 """
 
 import sqlite3
-import csv
+from SQLload import import_csv, create_indexes
+from SQLspatial import STRIP, create_spatial_index, nodes_within
 
 # Name of SQL DB
 SQL_DB = 'sqldb.db'
 
+# Set to True to pick up an interrupted import where it stopped, keeping
+# the rows it already committed
+RESUME = False
+
 # DB Connection
 conn = sqlite3.connect(SQL_DB)
 
@@ -18,15 +23,19 @@ conn = sqlite3.connect(SQL_DB)
 c = conn.cursor()
 
 # Drop old tables
-c.execute('''DROP TABLE IF EXISTS nodes_tags''')
-c.execute('''DROP TABLE IF EXISTS nodes''')
-c.execute('''DROP TABLE IF EXISTS ways''')
-c.execute('''DROP TABLE IF EXISTS ways_tags''')
-c.execute('''DROP TABLE IF EXISTS ways_nodes''')
-conn.commit()
+if not RESUME:
+    c.execute('''DROP TABLE IF EXISTS nodes_tags''')
+    c.execute('''DROP TABLE IF EXISTS nodes''')
+    c.execute('''DROP TABLE IF EXISTS ways''')
+    c.execute('''DROP TABLE IF EXISTS ways_tags''')
+    c.execute('''DROP TABLE IF EXISTS ways_nodes''')
+    c.execute('''DROP TABLE IF EXISTS relations''')
+    c.execute('''DROP TABLE IF EXISTS relations_tags''')
+    c.execute('''DROP TABLE IF EXISTS relations_members''')
+    conn.commit()
 
 # Create nodes table
-c.execute('''CREATE TABLE nodes (
+c.execute('''CREATE TABLE IF NOT EXISTS nodes (
     id INTEGER PRIMARY KEY NOT NULL,
     lat REAL,
     lon REAL,
@@ -38,20 +47,12 @@ c.execute('''CREATE TABLE nodes (
 )''')
 
 # Pass csv into nodes table
-with open ('nodes.csv', 'rb') as f:
-    dr = csv.DictReader(f)
-    to_db = [(i['id'], i['lat'], i['lon'], i['user'].decode("utf-8"), 
-              i['uid'], i['version'], i['changeset'], 
-              i['timestamp']) for i in dr]
-
-c.executemany('''INSERT INTO nodes (id, lat, lon, user, uid, version, 
-                                    changeset, timestamp) 
-                 VALUES (?, ?, ?, ?, ?, ?, ?, ?);''', to_db)
-
-conn.commit()
+import_csv(conn, 'nodes.csv', 'nodes',
+           ['id', 'lat', 'lon', 'user', 'uid', 'version', 'changeset', 'timestamp'],
+           decode=['user'], resume=RESUME)
 
 # Create nodes_tags table
-c.execute('''CREATE TABLE nodes_tags (
+c.execute('''CREATE TABLE IF NOT EXISTS nodes_tags (
     id INTEGER,
     key TEXT,
     value TEXT,
@@ -60,19 +61,12 @@ c.execute('''CREATE TABLE nodes_tags (
 )''')
 
 # Pass csv into nodes_tags table
-with open ('nodes_tags.csv', 'rb') as f:
-    dr = csv.DictReader(f)
-    to_db = [(i['id'], i['key'], i['value'].decode("utf-8"), 
-              i['type']) for i in dr]
-
-c.executemany('''INSERT INTO nodes_tags (id, key, value, type) 
-                 VALUES (?, ?, ?, ?);''', to_db)
-
-conn.commit()
+import_csv(conn, 'nodes_tags.csv', 'nodes_tags', ['id', 'key', 'value', 'type'],
+           decode=['key', 'value', 'type'], resume=RESUME)
 
 
 # Create ways table
-c.execute('''CREATE TABLE ways (
+c.execute('''CREATE TABLE IF NOT EXISTS ways (
     id INTEGER PRIMARY KEY NOT NULL,
     user TEXT,
     uid INTEGER,
@@ -82,19 +76,12 @@ c.execute('''CREATE TABLE ways (
 ) ''')
 
 # Pass csv into ways table
-with open ('ways.csv', 'rb') as f:
-    dr = csv.DictReader(f)
-    to_db = [(i['id'], i['user'].decode("utf-8"), i['uid'], i['version'], 
-              i['changeset'], i['timestamp']) for i in dr]
-
-c.executemany('''INSERT INTO ways (id, user, uid, version, changeset,
-                                    timestamp)
-                 VALUES (?, ?, ?, ?, ?, ?);''', to_db)
-
-conn.commit()
+import_csv(conn, 'ways.csv', 'ways',
+           ['id', 'user', 'uid', 'version', 'changeset', 'timestamp'],
+           decode=['user'], resume=RESUME)
 
 # Create ways_tags table
-c.execute('''CREATE TABLE ways_tags (
+c.execute('''CREATE TABLE IF NOT EXISTS ways_tags (
     id INTEGER NOT NULL,
     key TEXT NOT NULL,
     value TEXT NOT NULL,
@@ -103,18 +90,11 @@ c.execute('''CREATE TABLE ways_tags (
 )''')
 
 # Pass csv into ways_tags table
-with open ('ways_tags.csv', 'rb') as f:
-    dr = csv.DictReader(f)
-    to_db = [(i['id'], i['key'], i['value'].decode("utf-8"),
-              i['type']) for i in dr]
-
-c.executemany('''INSERT INTO ways_tags (id, key, value, type) 
-                 VALUES (?, ?, ?, ?);''', to_db)
-
-conn.commit()
+import_csv(conn, 'ways_tags.csv', 'ways_tags', ['id', 'key', 'value', 'type'],
+           decode=['key', 'value', 'type'], resume=RESUME)
 
 # Create ways_nodes table
-c.execute('''CREATE TABLE ways_nodes (
+c.execute('''CREATE TABLE IF NOT EXISTS ways_nodes (
     id INTEGER NOT NULL,
     node_id INTEGER NOT NULL,
     position INTEGER NOT NULL,
@@ -123,14 +103,57 @@ c.execute('''CREATE TABLE ways_nodes (
 )''')
 
 # Pass csv into ways_nodes table
-with open ('ways_nodes.csv', 'rb') as f:
-    dr = csv.DictReader(f)
-    to_db = [(i['id'], i['node_id'], i['position']) for i in dr]
+import_csv(conn, 'ways_nodes.csv', 'ways_nodes', ['id', 'node_id', 'position'],
+           resume=RESUME)
 
-c.executemany('''INSERT INTO ways_nodes (id, node_id, position) 
-                 VALUES (?, ?, ?);''', to_db)
+# Create relations table
+c.execute('''CREATE TABLE IF NOT EXISTS relations (
+    id INTEGER PRIMARY KEY NOT NULL,
+    user TEXT,
+    uid INTEGER,
+    version TEXT,
+    changeset INTEGER,
+    timestamp TEXT
+)''')
 
-conn.commit()
+# Pass csv into relations table
+import_csv(conn, 'relations.csv', 'relations',
+           ['id', 'user', 'uid', 'version', 'changeset', 'timestamp'],
+           decode=['user'], resume=RESUME)
+
+# Create relations_tags table
+c.execute('''CREATE TABLE IF NOT EXISTS relations_tags (
+    id INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    type TEXT,
+    FOREIGN KEY (id) REFERENCES relations(id)
+)''')
+
+# Pass csv into relations_tags table
+import_csv(conn, 'relations_tags.csv', 'relations_tags', ['id', 'key', 'value', 'type'],
+           decode=['key', 'value', 'type'], resume=RESUME)
+
+# Create relations_members table
+c.execute('''CREATE TABLE IF NOT EXISTS relations_members (
+    id INTEGER NOT NULL,
+    member_id INTEGER NOT NULL,
+    member_type TEXT NOT NULL,
+    role TEXT,
+    position INTEGER NOT NULL,
+    FOREIGN KEY (id) REFERENCES relations(id)
+)''')
+
+# Pass csv into relations_members table
+import_csv(conn, 'relations_members.csv', 'relations_members',
+           ['id', 'member_id', 'member_type', 'role', 'position'],
+           decode=['role'], resume=RESUME)
+
+# Index the loaded tables and ANALYZE them for the queries below
+create_indexes(conn)
+
+# Fill the R*Trees behind the nearby searches
+create_spatial_index(conn)
 
 
 # ------------------------------------------------
@@ -219,5 +242,10 @@ def casinos():
     return cas.fetchone()[0]
 print casinos()
 
+# Cafes within 1 km of the Strip
+def strip_cafes():
+    return len(nodes_within(conn, STRIP[0], STRIP[1], 1000, value='cafe'))
+print strip_cafes()
+
 # Close DB connection
 conn.close()
\ No newline at end of file
@@ -0,0 +1,136 @@
+CREATE TABLE tag_keys (
+    id INTEGER PRIMARY KEY NOT NULL,
+    key TEXT NOT NULL
+);
+
+CREATE TABLE tag_values (
+    id INTEGER PRIMARY KEY NOT NULL,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY NOT NULL,
+    user TEXT NOT NULL
+);
+
+CREATE TABLE nodes_enc (
+    id INTEGER PRIMARY KEY NOT NULL,
+    lat REAL,
+    lon REAL,
+    user_id INTEGER,
+    uid INTEGER,
+    version INTEGER,
+    changeset INTEGER,
+    timestamp TEXT,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+CREATE TABLE nodes_tags_enc (
+    id INTEGER,
+    key_id INTEGER,
+    value_id INTEGER,
+    type_id INTEGER,
+    FOREIGN KEY (id) REFERENCES nodes_enc(id),
+    FOREIGN KEY (key_id) REFERENCES tag_keys(id),
+    FOREIGN KEY (value_id) REFERENCES tag_values(id),
+    FOREIGN KEY (type_id) REFERENCES tag_keys(id)
+);
+
+CREATE TABLE ways_enc (
+    id INTEGER PRIMARY KEY NOT NULL,
+    user_id INTEGER,
+    uid INTEGER,
+    version TEXT,
+    changeset INTEGER,
+    timestamp TEXT,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+CREATE TABLE ways_tags_enc (
+    id INTEGER NOT NULL,
+    key_id INTEGER NOT NULL,
+    value_id INTEGER NOT NULL,
+    type_id INTEGER,
+    FOREIGN KEY (id) REFERENCES ways_enc(id),
+    FOREIGN KEY (key_id) REFERENCES tag_keys(id),
+    FOREIGN KEY (value_id) REFERENCES tag_values(id),
+    FOREIGN KEY (type_id) REFERENCES tag_keys(id)
+);
+
+CREATE TABLE ways_nodes (
+    id INTEGER NOT NULL,
+    node_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    FOREIGN KEY (id) REFERENCES ways_enc(id),
+    FOREIGN KEY (node_id) REFERENCES nodes_enc(id)
+);
+
+CREATE TABLE relations_enc (
+    id INTEGER PRIMARY KEY NOT NULL,
+    user_id INTEGER,
+    uid INTEGER,
+    version TEXT,
+    changeset INTEGER,
+    timestamp TEXT,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+CREATE TABLE relations_tags_enc (
+    id INTEGER NOT NULL,
+    key_id INTEGER NOT NULL,
+    value_id INTEGER NOT NULL,
+    type_id INTEGER,
+    FOREIGN KEY (id) REFERENCES relations_enc(id),
+    FOREIGN KEY (key_id) REFERENCES tag_keys(id),
+    FOREIGN KEY (value_id) REFERENCES tag_values(id),
+    FOREIGN KEY (type_id) REFERENCES tag_keys(id)
+);
+
+-- member_id refers to nodes, ways or relations depending on member_type
+CREATE TABLE relations_members (
+    id INTEGER NOT NULL,
+    member_id INTEGER NOT NULL,
+    member_type TEXT NOT NULL,
+    role TEXT,
+    position INTEGER NOT NULL,
+    FOREIGN KEY (id) REFERENCES relations_enc(id)
+);
+
+CREATE VIEW nodes AS
+    SELECT n.id, n.lat, n.lon,
+           (SELECT user FROM users WHERE users.id = n.user_id) AS user,
+           n.uid, n.version, n.changeset, n.timestamp
+    FROM nodes_enc n;
+
+CREATE VIEW nodes_tags AS
+    SELECT t.id, k.key, v.value,
+           (SELECT key FROM tag_keys WHERE tag_keys.id = t.type_id) AS type
+    FROM nodes_tags_enc t
+    JOIN tag_keys k ON k.id = t.key_id
+    JOIN tag_values v ON v.id = t.value_id;
+
+CREATE VIEW ways AS
+    SELECT w.id,
+           (SELECT user FROM users WHERE users.id = w.user_id) AS user,
+           w.uid, w.version, w.changeset, w.timestamp
+    FROM ways_enc w;
+
+CREATE VIEW ways_tags AS
+    SELECT t.id, k.key, v.value,
+           (SELECT key FROM tag_keys WHERE tag_keys.id = t.type_id) AS type
+    FROM ways_tags_enc t
+    JOIN tag_keys k ON k.id = t.key_id
+    JOIN tag_values v ON v.id = t.value_id;
+
+CREATE VIEW relations AS
+    SELECT r.id,
+           (SELECT user FROM users WHERE users.id = r.user_id) AS user,
+           r.uid, r.version, r.changeset, r.timestamp
+    FROM relations_enc r;
+
+CREATE VIEW relations_tags AS
+    SELECT t.id, k.key, v.value,
+           (SELECT key FROM tag_keys WHERE tag_keys.id = t.type_id) AS type
+    FROM relations_tags_enc t
+    JOIN tag_keys k ON k.id = t.key_id
+    JOIN tag_values v ON v.id = t.value_id;
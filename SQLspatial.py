@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+'''
+Spatial index over the SQL database, for questions like "which cafes are
+within 1 km of the Strip" without scanning every node:
+- nodes_rtree holds a point box per node (from nodes.lat/lon), ways_rtree
+  the bounding box of each way's nodes (from ways_nodes joined to nodes).
+  Both are SQLite R*Tree virtual tables.
+- create_spatial_index() fills them once the tables are loaded (SQLload
+  calls it with the other indexes); refresh() keeps single elements up to
+  date for SQLupdate.py
+- nodes_in_bbox(), nodes_within() and ways_in_bbox() search the R*Trees,
+  optionally joined to nodes_tags/ways_tags on a key and/or value
+
+The R*Tree stores 32 bit floats, rounded outwards, so every search is
+checked again against the exact nodes.lat/lon.
+'''
+
+import math
+import sqlite3
+import sys
+
+# Mean earth radius, meters
+EARTH_RADIUS = 6371008.8
+
+# The Las Vegas Strip, between the Bellagio and Caesars Palace
+STRIP = (36.1147, -115.1728)
+
+SPATIAL_TABLES = ['nodes_rtree', 'ways_rtree']
+
+
+def create_spatial_index(conn):
+    """(Re)build the node and way R*Trees from the loaded tables"""
+    for table in SPATIAL_TABLES:
+        conn.execute('DROP TABLE IF EXISTS {0}'.format(table))
+        conn.execute('''CREATE VIRTUAL TABLE {0} USING rtree(
+            id, min_lat, max_lat, min_lon, max_lon)'''.format(table))
+
+    conn.execute('''INSERT INTO nodes_rtree
+                    SELECT id, lat, lat, lon, lon FROM nodes
+                    WHERE lat IS NOT NULL AND lon IS NOT NULL''')
+    # Ways of a sample may reference nodes that aren't loaded: box the rest
+    conn.execute('''INSERT INTO ways_rtree
+                    SELECT ways_nodes.id, MIN(lat), MAX(lat), MIN(lon), MAX(lon)
+                    FROM ways_nodes JOIN nodes ON nodes.id = ways_nodes.node_id
+                    GROUP BY ways_nodes.id''')
+    conn.commit()
+
+
+def has_spatial_index(conn):
+    row = conn.execute('''SELECT COUNT(*) FROM sqlite_master
+                          WHERE type = 'table' AND name = 'nodes_rtree' ''').fetchone()
+    return row[0] > 0
+
+
+def _refresh_way(conn, way_id):
+    conn.execute('DELETE FROM ways_rtree WHERE id = ?', (way_id,))
+    conn.execute('''INSERT INTO ways_rtree
+                    SELECT ways_nodes.id, MIN(lat), MAX(lat), MIN(lon), MAX(lon)
+                    FROM ways_nodes JOIN nodes ON nodes.id = ways_nodes.node_id
+                    WHERE ways_nodes.id = ?
+                    GROUP BY ways_nodes.id''', (way_id,))
+
+
+def refresh(conn, element_type, element_id):
+    """Bring the R*Tree entry of one node or way in line with its rows
+
+    A node that moved also moves the boxes of the ways using it. Call it
+    after the element's rows were replaced or deleted.
+    """
+    element_id = int(element_id)
+    if element_type == 'node':
+        conn.execute('DELETE FROM nodes_rtree WHERE id = ?', (element_id,))
+        conn.execute('''INSERT INTO nodes_rtree
+                        SELECT id, lat, lat, lon, lon FROM nodes
+                        WHERE id = ? AND lat IS NOT NULL AND lon IS NOT NULL''',
+                     (element_id,))
+        way_ids = [row[0] for row in conn.execute(
+            'SELECT DISTINCT id FROM ways_nodes WHERE node_id = ?', (element_id,))]
+        for way_id in way_ids:
+            _refresh_way(conn, way_id)
+    elif element_type == 'way':
+        _refresh_way(conn, element_id)
+
+
+# ================================================== #
+#               Helper Functions                     #
+# ================================================== #
+def distance(lat1, lon1, lat2, lon2):
+    """Great circle (haversine) distance in meters"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2 +
+         math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_bbox(lat, lon, radius):
+    """Return (min_lat, min_lon, max_lat, max_lon) around a circle of radius meters"""
+    dlat = math.degrees(float(radius) / EARTH_RADIUS)
+    dlon = dlat / max(math.cos(math.radians(lat)), 1e-12)
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+
+def _tag_filter(tags_table, key, value):
+    """Return (condition, params) keeping only elements r.id with the tag"""
+    if key is None and value is None:
+        return '', []
+    where = ['t.id = r.id']
+    params = []
+    if key is not None:
+        where.append('t.key = ?')
+        params.append(key)
+    if value is not None:
+        where.append('t.value = ?')
+        params.append(value)
+    condition = 'AND EXISTS (SELECT 1 FROM {0} t WHERE {1})'.format(
+        tags_table, ' AND '.join(where))
+    return condition, params
+
+
+# ================================================== #
+#               Query API                            #
+# ================================================== #
+def nodes_in_bbox(conn, min_lat, min_lon, max_lat, max_lon, key=None, value=None):
+    """Return (id, lat, lon) of the nodes inside the box, optionally only
+    those with a nodes_tags key and/or value"""
+    tagged, params = _tag_filter('nodes_tags', key, value)
+    sql = '''SELECT nodes.id, nodes.lat, nodes.lon
+             FROM nodes_rtree r
+             JOIN nodes ON nodes.id = r.id
+             WHERE r.min_lat <= ? AND r.max_lat >= ?
+               AND r.min_lon <= ? AND r.max_lon >= ?
+               AND nodes.lat BETWEEN ? AND ?
+               AND nodes.lon BETWEEN ? AND ? {0}
+             ORDER BY nodes.id'''.format(tagged)
+    return conn.execute(sql, [max_lat, min_lat, max_lon, min_lon,
+                              min_lat, max_lat, min_lon, max_lon] + params).fetchall()
+
+
+def nodes_within(conn, lat, lon, radius, key=None, value=None):
+    """Return (distance in meters, id, lat, lon) of the nodes within radius
+    meters of (lat, lon), nearest first, optionally filtered on a tag"""
+    box = radius_bbox(lat, lon, radius)
+    found = []
+    for node_id, node_lat, node_lon in nodes_in_bbox(conn, *box, key=key, value=value):
+        d = distance(lat, lon, node_lat, node_lon)
+        if d <= radius:
+            found.append((d, node_id, node_lat, node_lon))
+    found.sort()
+    return found
+
+
+def ways_in_bbox(conn, min_lat, min_lon, max_lat, max_lon, key=None, value=None):
+    """Return (id, min_lat, max_lat, min_lon, max_lon) of the ways whose
+    bounding box overlaps the box, optionally filtered on a ways_tags tag
+
+    The way boxes are the rounded R*Tree ones, so this is the candidate set:
+    check the way's nodes if an exact answer matters.
+    """
+    tagged, params = _tag_filter('ways_tags', key, value)
+    sql = '''SELECT r.id, r.min_lat, r.max_lat, r.min_lon, r.max_lon
+             FROM ways_rtree r
+             WHERE r.min_lat <= ? AND r.max_lat >= ?
+               AND r.min_lon <= ? AND r.max_lon >= ? {0}
+             ORDER BY r.id'''.format(tagged)
+    return conn.execute(sql, [max_lat, min_lat, max_lon, min_lon] + params).fetchall()
+
+
+if __name__ == '__main__':
+    # Usage: python SQLspatial.py [db] -- cafes within 1 km of the Strip
+    conn = sqlite3.connect(sys.argv[1] if len(sys.argv) > 1 else 'sqldb.db')
+    if not has_spatial_index(conn):
+        create_spatial_index(conn)
+    for cafe in nodes_within(conn, STRIP[0], STRIP[1], 1000, value='cafe'):
+        print '%6.0f m  node %d (%.7f, %.7f)' % cafe
+    conn.close()
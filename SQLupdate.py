@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+'''
+Apply OSM change files (.osc, .osc.gz) to the SQL database built by
+SQLquery.py or SQLload.py, instead of rebuilding it from a new extract:
+- Stream the <create>, <modify> and <delete> blocks of the change file
+- Shape created and modified elements with VegasData.shape_rows(), so the
+  city/state cleaning is applied exactly as in a full load
+- Replace the element's row, tags and way nodes/relation members; deletes
+  remove all three
+- Keep the SQLspatial.py R*Trees, if the database has them, in step
+- Apply each change file in a single transaction
+
+The deletes look rows up by id, so build the indexes (SQLload.create_indexes)
+before applying changes to a large database.
+'''
+
+import gzip
+import sqlite3
+import sys
+
+import VegasData
+import VegasStream
+from SQLload import SQL_DB, TABLES, insert_sql
+from SQLspatial import has_spatial_index, refresh
+
+# Tables holding each element type; the first is keyed on id, the others
+# reference it through their id column
+ELEMENT_TABLES = {'node': ('nodes', 'nodes_tags'),
+                  'way': ('ways', 'ways_tags', 'ways_nodes'),
+                  'relation': ('relations', 'relations_tags', 'relations_members')}
+
+
+def open_change(path):
+    """Open a change file, gzipped or not"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def apply_change(osc_path, db_path=SQL_DB):
+    """Apply one change file to the SQL DB, return counts per action"""
+    conn = sqlite3.connect(db_path)
+    # shape_rows() values are utf-8 encoded already, store them as they are
+    conn.text_factory = str
+
+    inserts = dict((table, insert_sql(table, fields)) for table, fields in TABLES)
+    deletes = dict((table, 'DELETE FROM {0} WHERE id = ?'.format(table))
+                   for table, _ in TABLES)
+
+    counts = {'create': 0, 'modify': 0, 'delete': 0}
+    spatial = has_spatial_index(conn)
+    osc_file = open_change(osc_path)
+    try:
+        for action, element in VegasStream.get_change(osc_file):
+            tables = ELEMENT_TABLES.get(element.tag)
+            if tables is None or action not in counts:
+                continue
+
+            # Create and modify are upserts: drop whatever is there first
+            element_id = element.attrib['id']
+            for table in tables:
+                conn.execute(deletes[table], (element_id,))
+
+            if action != 'delete':
+                row, tags, children = VegasData.shape_rows(element)
+                conn.execute(inserts[tables[0]], row)
+                conn.executemany(inserts[tables[1]], tags)
+                if element.tag != 'node':
+                    # way nodes or relation members
+                    conn.executemany(inserts[tables[2]], children)
+
+            if spatial:
+                refresh(conn, element.tag, element_id)
+            counts[action] += 1
+        conn.commit()
+    except:
+        conn.rollback()
+        raise
+    finally:
+        osc_file.close()
+        conn.close()
+
+    return counts
+
+
+if __name__ == '__main__':
+    # Usage: python SQLupdate.py change1.osc.gz [change2.osc.gz ...]
+    for path in sys.argv[1:]:
+        print path, apply_change(path)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+# The tag count, tag type, user count and audit scripts each parse the
+# whole OSM file on their own. This module streams the file once and hands
+# every top level element to a set of analyzers, so a full report costs a
+# single parse no matter how many questions are asked.
+
+from collections import defaultdict
+import pprint
+
+import VegasAudit
+import VegasTagIndex
+import VegasTagTypes
+from VegasStream import ElementStream
+
+OSM = 'las-vegas_nevada.osm'
+SAMPLE = 'sample.osm'
+
+# Registered analyzer classes, by name
+ANALYZERS = {}
+
+
+def register_analyzer(cls):
+    """Class decorator adding an analyzer to the default set"""
+    ANALYZERS[cls.name] = cls
+    return cls
+
+
+class Analyzer(object):
+    """Base class for analyzers run by run_analyses()
+
+    start() receives the <osm> root before any children are parsed,
+    process() receives each complete top level element and result()
+    returns the finished answer once the file has been read.
+    """
+    name = None
+
+    def start(self, root):
+        pass
+
+    def process(self, element):
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+
+# ================================================== #
+#               Analyzers                            #
+# ================================================== #
+
+# Same counts as VegasMapParse.count_tags
+@register_analyzer
+class TagCounter(Analyzer):
+    name = 'tags'
+
+    def __init__(self):
+        self.tags = defaultdict(int)
+
+    def start(self, root):
+        self.tags[root.tag] += 1
+
+    def process(self, element):
+        for elem in element.iter():
+            self.tags[elem.tag] += 1
+
+    def result(self):
+        return dict(self.tags)
+
+
+# Same counts as VegasTagTypes.process_map
+@register_analyzer
+class KeyTypeCounter(Analyzer):
+    name = 'key_types'
+
+    def __init__(self):
+        self.keys = {"lower": 0, "lower_colon": 0, "problemchars": 0, "other": 0}
+
+    def process(self, element):
+        for tag in element.iter('tag'):
+            VegasTagTypes.key_type(tag, self.keys)
+
+    def result(self):
+        return self.keys
+
+
+# Same set as VegasUserCount.process_map
+@register_analyzer
+class UserCounter(Analyzer):
+    name = 'users'
+
+    def __init__(self):
+        self.users = set()
+
+    def process(self, element):
+        if 'uid' in element.attrib:
+            self.users.add(element.get('uid'))
+
+    def result(self):
+        return self.users
+
+
+# Same audit as VegasAudit.audit
+@register_analyzer
+class StreetTypeAudit(Analyzer):
+    name = 'street_types'
+
+    def __init__(self):
+        self.street_types = defaultdict(set)
+
+    def process(self, element):
+        if element.tag == 'node' or element.tag == 'way':
+            for tag in element.iter('tag'):
+                if VegasAudit.is_street_name(tag):
+                    VegasAudit.audit_street_type(self.street_types, tag.attrib['v'])
+
+    def result(self):
+        return self.street_types
+
+
+# Same audit as VegasAudit.state_name_audit
+@register_analyzer
+class StateNameAudit(Analyzer):
+    name = 'states'
+
+    def __init__(self):
+        self.not_expected = set()
+
+    def process(self, element):
+        if element.tag == 'node' or element.tag == 'way':
+            for tag in element.iter('tag'):
+                if VegasAudit.is_state(tag) and tag.attrib['v'] != 'NV':
+                    self.not_expected.add(tag.attrib['v'])
+
+    def result(self):
+        return self.not_expected
+
+
+# Same audit as VegasAudit.city_name_audit
+@register_analyzer
+class CityNameAudit(Analyzer):
+    name = 'cities'
+
+    def __init__(self):
+        self.not_city = set()
+
+    def process(self, element):
+        if element.tag == 'node' or element.tag == 'way':
+            for tag in element.iter('tag'):
+                if VegasAudit.is_city(tag) and tag.attrib['v'] != 'Las Vegas':
+                    self.not_city.add(tag.attrib['v'])
+
+    def result(self):
+        return self.not_city
+
+
+# Which elements have each tag key=value, see VegasTagIndex.py. The index
+# grows with the file, so it isn't registered: pass TagIndexer() to
+# run_analyses() explicitly. Takes the same keys as VegasTagIndex.TagIndex.
+class TagIndexer(Analyzer):
+    name = 'tag_index'
+
+    def __init__(self, keys=VegasTagIndex.CLEANED_KEYS):
+        self.index = VegasTagIndex.TagIndex(keys)
+
+    def process(self, element):
+        self.index.add(element)
+
+    def result(self):
+        return self.index
+
+
+# ================================================== #
+#               Main Function                        #
+# ================================================== #
+def run_analyses(osmfile, analyzers=None):
+    """Stream osmfile once and return {name: result} for every analyzer
+
+    analyzers may hold registered names or Analyzer instances; by default
+    every registered analyzer is run.
+    """
+    if analyzers is None:
+        analyzers = sorted(ANALYZERS)
+    analyzers = [ANALYZERS[a]() if isinstance(a, basestring) else a
+                 for a in analyzers]
+
+    def start(root):
+        for analyzer in analyzers:
+            analyzer.start(root)
+
+    for elem in ElementStream(osmfile, on_root=start):
+        for analyzer in analyzers:
+            analyzer.process(elem)
+
+    return dict((analyzer.name, analyzer.result()) for analyzer in analyzers)
+
+
+if __name__ == '__main__':
+    results = run_analyses(OSM, sorted(ANALYZERS) + [TagIndexer()])
+    pprint.pprint(results['tags'])
+    pprint.pprint(results['key_types'])
+    print '# of Unique UIDs:'
+    print len(results['users'])
+    for street_type, ways in results['street_types'].iteritems():
+        for name in ways:
+            print name, "=>", VegasAudit.update_name(name, VegasAudit.mapping)
+    print results['states']
+    print results['cities']
+    # Keep the tag index for the fix-ups (VegasTagIndex.cleaning_targets)
+    results['tag_index'].save(OSM + VegasTagIndex.TAG_INDEX_SUFFIX)
@@ -6,7 +6,7 @@ Data Wrangling Project
 By: Kyle Campbell
 """
 # Import needed modules
-import xml.etree.cElementTree as ET
+from VegasStream import get_element
 from collections import defaultdict
 import re
 import pprint
@@ -81,38 +81,85 @@ def is_street_name(elem):
     return (elem.attrib['k'] == "addr:street")
 
 # Audit street types and return list
-def audit(osmfile):
-    osm_file = open(osmfile, "r")
+# Pass a VegasTagIndex.TagIndex as index to keep which elements have each
+# tag value, so the fix-ups don't need another scan
+def audit(osmfile, index=None):
     street_types = defaultdict(set)
-    for event, elem in ET.iterparse(osm_file, events=("start",)):
-
-        if elem.tag == "node" or elem.tag == "way":
-            for tag in elem.iter("tag"):
-                if is_street_name(tag):
-                    audit_street_type(street_types, tag.attrib['v'])
-    osm_file.close()
+    for elem in get_element(osmfile, tags=("node", "way")):
+        if index is not None:
+            index.add(elem)
+        for tag in elem.iter("tag"):
+            if is_street_name(tag):
+                audit_street_type(street_types, tag.attrib['v'])
     return street_types
 
 # Print results of audit
 # pprint.pprint(audit(SAMPLE))
 # pprint.pprint(audit(OSM))
 
+# Compiled street name cleaner. Only the street type token (the one
+# street_type_re finds) is looked at, so "St" no longer hits "Stone" or
+# "Ste", and one regex replaces the scan over every mapping entry.
+# Stop caching past this many distinct street names, so a planet-sized
+# audit doesn't grow the cache without bound
+MAX_NAMES = 100000
+
+
+class StreetNormalizer(object):
+    def __init__(self, mapping):
+        self.source = mapping
+        self.mapping = dict(mapping)
+        # Longest first, so "Ave." wins over "Ave"
+        keys = sorted(self.mapping, key=len, reverse=True)
+        self.pattern = re.compile(r'(?<!\S)(%s)$' % '|'.join(re.escape(k) for k in keys))
+        # OSM repeats the same street names a lot, remember each answer
+        self.cache = {}
+
+    def _replace(self, m):
+        return self.mapping[m.group(1)]
+
+    def __call__(self, name):
+        try:
+            return self.cache[name]
+        except KeyError:
+            new_name = self.pattern.sub(self._replace, name)
+            if len(self.cache) < MAX_NAMES:
+                self.cache[name] = new_name
+            return new_name
+
+    def normalize_all(self, names):
+        """Clean a whole column of names
+
+        names may be a pandas Series, a NumPy array or any iterable; the
+        result has the same type (a list for plain iterables). Each distinct
+        name is cleaned once.
+        """
+        if hasattr(names, 'unique') and hasattr(names, 'map'):
+            lookup = dict((name, self.clean(name)) for name in names.unique())
+            return names.map(lookup)
+        if hasattr(names, 'dtype'):
+            import numpy as np
+            uniques, inverse = np.unique(names, return_inverse=True)
+            cleaned = np.array([self.clean(name) for name in uniques], dtype=object)
+            return cleaned[inverse]
+        return [self.clean(name) for name in names]
+
+    def clean(self, name):
+        # Leave missing values (None, NaN) in a column alone
+        if isinstance(name, basestring):
+            return self(name)
+        return name
+
+
+normalize_street = StreetNormalizer(mapping)
+
 # Update/clean street names
 def update_name(name, mapping):
-    for key, value in mapping.iteritems():
-        if key in name:
-            name = name.replace(key, value)
-            break
-    return name
+    if mapping is normalize_street.source:
+        return normalize_street(name)
+    return StreetNormalizer(mapping)(name)
     
-# Print old -> new street names
-update_street = audit(SAMPLE) 
-for street_type, ways in update_street.iteritems():
-    for name in ways:
-        new_name = update_name(name, mapping)
-        print name, "=>", new_name  
-        
-        
+
 # -------------------------------------------------
 # |               STATE NAME AUDIT                |
 # |                                               |
@@ -123,24 +170,17 @@ def is_state(element):
     return (element.attrib['k'] == 'addr:state')
 
 # Audit state name
-def state_name_audit(osmfile):
-    osm_file = open(osmfile, 'r')
+def state_name_audit(osmfile, index=None):
     not_expected = set()
-    for event, element in ET.iterparse(osm_file, events=('start',)):
-        
-        if element.tag == 'node' or element.tag == 'way':
-            for tag in element.iter('tag'):
-                if is_state(tag):
-                    if tag.attrib['v'] != 'NV':
-                        not_expected.add(tag.attrib['v'])
-                        
-    osm_file.close()
+    for element in get_element(osmfile, tags=('node', 'way')):
+        if index is not None:
+            index.add(element)
+        for tag in element.iter('tag'):
+            if is_state(tag):
+                if tag.attrib['v'] != 'NV':
+                    not_expected.add(tag.attrib['v'])
     return not_expected
 
-# Print state names that are not 'NV'
-# print state_name_audit(SAMPLE)
-print state_name_audit(OSM)
-        
 # -------------------------------------------------
 # |               CITY NAME AUDIT                 |
 # |                                               |
@@ -151,20 +191,31 @@ def is_city(element):
     return (element.attrib['k'] == 'addr:city')
 
 # Audit city name
-def city_name_audit(osmfile):
-    osm_file = open(osmfile, 'r')
+def city_name_audit(osmfile, index=None):
     not_city = set()
-    for event, element in ET.iterparse(osm_file, events=('start',)):
-        
-        if element.tag == 'node' or element.tag == 'way':
-            for tag in element.iter('tag'):
-                if is_city(tag):
-                    if tag.attrib['v'] != 'Las Vegas':
-                        not_city.add(tag.attrib['v'])
-                        
-    osm_file.close()
+    for element in get_element(osmfile, tags=('node', 'way')):
+        if index is not None:
+            index.add(element)
+        for tag in element.iter('tag'):
+            if is_city(tag):
+                if tag.attrib['v'] != 'Las Vegas':
+                    not_city.add(tag.attrib['v'])
     return not_city
 
-# Print city names that are not 'Las Vegas'
-# print_city_name_audit(SAMPLE)
-# print city_name_audit(OSM)
+
+if __name__ == '__main__':
+    # Print old -> new street names
+    update_street = audit(SAMPLE)
+    for street_type, ways in update_street.iteritems():
+        for name in ways:
+            new_name = update_name(name, mapping)
+            print name, "=>", new_name
+
+    # Print state names that are not 'NV'
+    # print state_name_audit(SAMPLE)
+    print state_name_audit(OSM)
+
+    # Print city names that are not 'Las Vegas'
+    # print_city_name_audit(SAMPLE)
+    # print city_name_audit(OSM)
+
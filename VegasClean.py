@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+# Declarative tag value cleaning. The rules live in cleaning_rules.json as
+#
+#   {"addr:city": {"Las vegas": "Las Vegas", ...}, "addr:state": {...}}
+#
+# i.e. tag key -> {bad value: clean value}. They are compiled into a single
+# dict keyed on (key, value), so cleaning a tag is one lookup, and every
+# rule counts how often it fires.
+
+import json
+import os
+from collections import defaultdict
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'cleaning_rules.json')
+
+
+class CleaningRules(object):
+    """Compiled tag value cleaning rules with per-rule hit counters"""
+
+    def __init__(self, rules):
+        self.rules = {}
+        for k, values in rules.iteritems():
+            for old, new in values.iteritems():
+                self.rules[(k, old)] = new
+        self.hits = defaultdict(int)
+        # Values rewritten so far, by any rule
+        self.cleaned = 0
+
+    def clean(self, k, v):
+        """Return the clean value for tag k=v (v itself if no rule matches)"""
+        new = self.rules.get((k, v))
+        if new is None:
+            return v
+        self.hits[(k, v)] += 1
+        self.cleaned += 1
+        return new
+
+    def keys(self):
+        """Return the set of tag keys that have rules"""
+        return set(k for k, _ in self.rules)
+
+    def report(self):
+        """Return (key, old value, new value, hits) for every rule, most hits first"""
+        rows = [(k, old, new, self.hits[(k, old)])
+                for (k, old), new in self.rules.iteritems()]
+        return sorted(rows, key=lambda row: (-row[3], row[0], row[1]))
+
+
+def load_rules(path=RULES_PATH):
+    """Load and compile a cleaning rules file"""
+    with open(path) as f:
+        return CleaningRules(json.load(f))
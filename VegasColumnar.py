@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+'''
+Write the node, way and relation tables as typed, columnar files instead
+of .csv text:
+- Take the column types from schema.schema (integer -> int64,
+  float -> float64, string -> utf8), so ids stay integers and lat/lon keep
+  full double precision with no re-parsing at load time
+- Buffer the shape_rows() tuples of each table and write them out as one
+  row group (Parquet) or record batch (Arrow IPC) every ROW_GROUP_SIZE rows,
+  so memory stays bounded while the OSM file streams through
+- Read back only the columns needed with read_table(); both formats are
+  memory-mapped
+
+pyarrow is optional: the rest of the project runs without it, only this
+module needs it.
+'''
+
+import os
+import pprint
+
+import schema
+import VegasData
+from VegasData import (NODE_FIELDS, NODE_TAGS_FIELDS, WAY_FIELDS,
+                       WAY_TAGS_FIELDS, WAY_NODES_FIELDS, RELATION_FIELDS,
+                       RELATION_MEMBERS_FIELDS, RELATION_TAGS_FIELDS)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+FORMATS = ('parquet', 'arrow')
+
+# Rows per Parquet row group / Arrow record batch
+ROW_GROUP_SIZE = 100000
+
+# Table name -> schema.schema entry and column order
+TABLES = [('nodes', 'node', NODE_FIELDS),
+          ('nodes_tags', 'node_tags', NODE_TAGS_FIELDS),
+          ('ways', 'way', WAY_FIELDS),
+          ('ways_nodes', 'way_nodes', WAY_NODES_FIELDS),
+          ('ways_tags', 'way_tags', WAY_TAGS_FIELDS),
+          ('relations', 'relation', RELATION_FIELDS),
+          ('relations_members', 'relation_members', RELATION_MEMBERS_FIELDS),
+          ('relations_tags', 'relation_tags', RELATION_TAGS_FIELDS)]
+
+
+# ================================================== #
+#               Helper Functions                     #
+# ================================================== #
+def _decode(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def _number(convert):
+    """Convert a non-empty value with convert, a missing ('') one to null"""
+    def number(value):
+        return convert(value) if value != '' else None
+    return number
+
+
+# schema.schema type -> python conversion of the shape_rows() values
+CONVERTERS = {'integer': _number(int),
+              'float': _number(float),
+              'string': _decode}
+
+
+def field_rules(name, osm_schema=schema.schema):
+    """Return the field -> rule dict of a schema.schema entry"""
+    entry = osm_schema[name]
+    if entry['type'] == 'list':
+        entry = entry['schema']
+    return entry['schema']
+
+
+def arrow_schema(fields, rules):
+    """Build the pyarrow schema for fields, typed from their schema rules"""
+    types = {'integer': pa.int64(), 'float': pa.float64(), 'string': pa.string()}
+    return pa.schema([pa.field(field, types[rules[field]['type']],
+                               nullable=not rules[field].get('required', False))
+                      for field in fields])
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError('columnar output needs pyarrow: pip install pyarrow')
+
+
+class ColumnarWriter(object):
+    """Write rows of fields to a Parquet or Arrow file, one row group at a time
+
+    Has the writerow/writerows interface of csv.writer, takes the
+    shape_rows() tuples.
+    """
+
+    def __init__(self, path, fields, rules, fmt='parquet',
+                 row_group_size=ROW_GROUP_SIZE):
+        _require_pyarrow()
+        if fmt not in FORMATS:
+            raise ValueError('unknown format {0!r}, expected one of {1}'.format(fmt, FORMATS))
+
+        self.converters = [CONVERTERS[rules[field]['type']] for field in fields]
+        self.schema = arrow_schema(fields, rules)
+        self.fmt = fmt
+        self.row_group_size = row_group_size
+        self.rows = []
+        self.count = 0
+
+        if fmt == 'parquet':
+            self.sink = None
+            self.writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self.sink = pa.OSFile(path, 'wb')
+            self.writer = pa.RecordBatchFileWriter(self.sink, self.schema)
+
+    def writerow(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def writerows(self, rows):
+        self.rows.extend(rows)
+        if len(self.rows) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows as one row group / record batch"""
+        if not self.rows:
+            return
+        columns = zip(*self.rows)
+        arrays = [pa.array([convert(value) for value in column], type=field.type)
+                  for convert, column, field in zip(self.converters, columns, self.schema)]
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        if self.fmt == 'parquet':
+            self.writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self.writer.write_batch(batch)
+        self.count += len(self.rows)
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+        if self.sink is not None:
+            self.sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_table(path, columns=None):
+    """Memory-map a file written by ColumnarWriter, keeping only columns"""
+    _require_pyarrow()
+    if path.endswith('.parquet'):
+        return pq.read_table(path, columns=columns, memory_map=True)
+
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    if columns is None:
+        return table
+    return pa.Table.from_arrays([table.column(c) for c in columns], names=columns)
+
+
+# ================================================== #
+#               Main Function                        #
+# ================================================== #
+def process_map_columnar(file_in, out_dir='.', fmt='parquet',
+                         row_group_size=ROW_GROUP_SIZE):
+    """Write each table to a <table>.<fmt> file in out_dir, return row counts"""
+    writers = {}
+    try:
+        for table, name, fields in TABLES:
+            path = os.path.join(out_dir, '{0}.{1}'.format(table, fmt))
+            writers[table] = ColumnarWriter(path, fields, field_rules(name), fmt,
+                                            row_group_size)
+
+        for element in VegasData.get_element(file_in, tags=('node', 'way', 'relation')):
+            row, tags, way_nodes = VegasData.shape_rows(element)
+            if element.tag == 'node':
+                writers['nodes'].writerow(row)
+                writers['nodes_tags'].writerows(tags)
+            elif element.tag == 'way':
+                writers['ways'].writerow(row)
+                writers['ways_nodes'].writerows(way_nodes)
+                writers['ways_tags'].writerows(tags)
+            else:
+                writers['relations'].writerow(row)
+                writers['relations_members'].writerows(way_nodes)
+                writers['relations_tags'].writerows(tags)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    return dict((table, writer.count) for table, writer in writers.items())
+
+
+if __name__ == '__main__':
+    pprint.pprint(process_map_columnar(VegasData.OSM_PATH))
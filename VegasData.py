@@ -21,11 +21,14 @@ The process for this transformation is as follows:
 # Import necessary modules
 import csv
 import codecs
+import itertools
 import pprint
-import re
-import xml.etree.cElementTree as ET
-import cerberus
 import schema
+import VegasClean
+import VegasEncode
+import VegasKeys
+import VegasStream
+import VegasValidate
 
 OSM_PATH = "las-vegas_nevada.osm"
 SAMPLE = 'sample.osm'
@@ -35,47 +38,48 @@ NODE_TAGS_PATH = "nodes_tags.csv"
 WAYS_PATH = "ways.csv"
 WAY_NODES_PATH = "ways_nodes.csv"
 WAY_TAGS_PATH = "ways_tags.csv"
-
-LOWER_COLON = re.compile(r'^([a-z]|_)+:([a-z]|_)+')
-PROBLEMCHARS = re.compile(r'[=\+/&<>;\'"\?%#$@\,\. \t\r\n]')
+RELATIONS_PATH = "relations.csv"
+RELATION_MEMBERS_PATH = "relations_members.csv"
+RELATION_TAGS_PATH = "relations_tags.csv"
+
+# Dictionary-encoded output, see VegasEncode.py (ways_nodes.csv and
+# relations_members.csv are shared)
+ENCODED_NODES_PATH = "nodes_enc.csv"
+ENCODED_NODE_TAGS_PATH = "nodes_tags_enc.csv"
+ENCODED_WAYS_PATH = "ways_enc.csv"
+ENCODED_WAY_TAGS_PATH = "ways_tags_enc.csv"
+ENCODED_RELATIONS_PATH = "relations_enc.csv"
+ENCODED_RELATION_TAGS_PATH = "relations_tags_enc.csv"
+LOOKUP_PATHS = {'tag_keys': "tag_keys.csv",
+                'tag_values': "tag_values.csv",
+                'users': "users.csv"}
+
+LOWER_COLON = VegasKeys.LOWER_COLON
+PROBLEMCHARS = VegasKeys.PROBLEMCHARS
+
+# Cached (type, key, class) for each distinct tag key
+classify_key = VegasKeys.classify_key
+
+# KeyClassifiers for non-default problem_chars / default_tag_type, built once
+# per pair so their caches last across elements
+_classifiers = {}
+
+
+def key_classifier(problem_chars=PROBLEMCHARS, default_tag_type='regular'):
+    """Return the KeyClassifier shape_rows() uses for these key arguments"""
+    if problem_chars is PROBLEMCHARS and default_tag_type == 'regular':
+        return classify_key
+    classify = _classifiers.get((problem_chars, default_tag_type))
+    if classify is None:
+        classify = VegasKeys.KeyClassifier(problem_chars, default_tag_type)
+        _classifiers[(problem_chars, default_tag_type)] = classify
+    return classify
 
 SCHEMA = schema.schema
 
-# City cleaning function to be passed to shape_element() function
-def update_city(element):
-    if element.tag == 'node' or element.tag == 'way':
-        for secondary in element:
-            if secondary.tag == 'tag':
-                if secondary.attrib['v'] != 'Las Vegas':
-                    if secondary.attrib['v'] == 'Las Vegas NV':
-                        secondary.attrib['v'] == 'Las Vegas'
-                    if secondary.attrib['v'] == 'Las vegas':
-                        secondary.attrib['v'] == 'Las Vegas'
-                    if secondary.attrib['v'] == 'Las Vegas, NV':
-                        secondary.attrib['v'] == 'Las Vegas'
-                    if secondary.attrib['v'] == 'las vegas':
-                        secondary.attrib['v'] == 'Las Vegas'
-                    if secondary.attrib['v'] == 'Las Vagas':
-                        secondary.attrib['v'] == 'Las Vegas'
-                    if secondary.attrib['v'] == 'LAS VEGAS':
-                        secondary.attrib['v'] == 'Las Vegas'
-                    else:
-                        pass
-                return secondary.attrib['v']
-    
-# State cleaning function to be passed to shape_element() function
-def update_state(element):
-    if element.tag == 'node' or element.tag == 'way':
-        for secondary in element:
-            if secondary.tag == 'tag':
-                if secondary.attrib['v'] != 'NV':
-                    if secondary.attrib['v'] =='nv':
-                        secondary.attrib['v'] == 'NV'
-                    if secondary.attrib['v'] =='Nevada':
-                        secondary.attrib['v'] == 'NV' 
-                    else:
-                        pass
-                return secondary.attrib['v']
+# City/state (and any other tag value) cleaning rules applied by
+# shape_element(), see cleaning_rules.json
+CLEANING_RULES = VegasClean.load_rules()
 
 # Make sure the fields order in the csvs matches the column order in the sql table schema
 NODE_FIELDS = ['id', 'lat', 'lon', 'user', 'uid', 'version', 'changeset', 'timestamp']
@@ -83,6 +87,13 @@ NODE_TAGS_FIELDS = ['id', 'key', 'value', 'type']
 WAY_FIELDS = ['id', 'user', 'uid', 'version', 'changeset', 'timestamp']
 WAY_TAGS_FIELDS = ['id', 'key', 'value', 'type']
 WAY_NODES_FIELDS = ['id', 'node_id', 'position']
+RELATION_FIELDS = ['id', 'user', 'uid', 'version', 'changeset', 'timestamp']
+RELATION_MEMBERS_FIELDS = ['id', 'member_id', 'member_type', 'role', 'position']
+RELATION_TAGS_FIELDS = ['id', 'key', 'value', 'type']
+
+# Relation members are written (and validated) this many at a time, since
+# a relation can have thousands of them
+MEMBER_CHUNK = 1000
 
 
 def shape_element(element, node_attr_fields=NODE_FIELDS, way_attr_fields=WAY_FIELDS,
@@ -104,32 +115,21 @@ def shape_element(element, node_attr_fields=NODE_FIELDS, way_attr_fields=WAY_FIE
         # Secondary Element Attribs
         for secondary in element:
             if secondary.tag == 'tag':
-                tag_dict = {}
-                tag_dict['id'] = element.attrib['id']
+                tag_type, key, _ = classify_key(secondary.attrib['k'])
                 
                 # Passing over problem characters
-                if PROBLEMCHARS.match(secondary.attrib['k']):
+                if key is None:
                     continue
                     
-                elif LOWER_COLON.match(secondary.attrib['k']):
-                    tag_dict['key'] = secondary.attrib['k'].split(':',1)[1]
-                    tag_dict['type'] = secondary.attrib['k'].split(':')[0]
-                    
-                    # use cleaning function for city/state on node_tags
-                    if secondary.attrib["k"] == 'addr:city':
-                        tag_dict['value'] = update_city(element)
-                    elif secondary.attrib["k"] == 'addr:state':
-                        tag_dict['value'] = update_state(element)
-                    else:
-                        tag_dict['value'] = secondary.attrib['v']
-                    tags.append(tag_dict) 
-                    
-                    
-                else:
-                    tag_dict['key'] = secondary.attrib['k']
-                    tag_dict['value'] = secondary.attrib['v']
-                    tag_dict['type'] = 'regular'
-                    tags.append(tag_dict)
+                tag_dict = {}
+                tag_dict['id'] = element.attrib['id']
+                tag_dict['key'] = key
+                tag_dict['type'] = tag_type
+                
+                # use cleaning rules (city/state) on node_tags
+                tag_dict['value'] = CLEANING_RULES.clean(secondary.attrib['k'],
+                                                         secondary.attrib['v'])
+                tags.append(tag_dict)
                     
         return {'node': node_attribs, 'node_tags': tags} 
         # print {'node': node_attribs, 'node_tags': tags}
@@ -153,50 +153,160 @@ def shape_element(element, node_attr_fields=NODE_FIELDS, way_attr_fields=WAY_FIE
                 way_nodes.append(way_node_dict)
                     
             elif secondary.tag == 'tag':  
-                way_tag_dict = {}
-                way_tag_dict['id'] = element.attrib['id']
+                tag_type, key, _ = classify_key(secondary.attrib['k'])
                 
                 # Passing over problem characters
-                if PROBLEMCHARS.match(secondary.attrib['k']):
+                if key is None:
                     continue
                         
-                elif LOWER_COLON.match(secondary.attrib['k']):
-                    way_tag_dict['key'] = secondary.attrib['k'].split(':',1)[1]
-                    way_tag_dict['type'] = secondary.attrib['k'].split(':')[0]
-                    
-                    # Use city/state cleaning functions on way_tags
-                    if secondary.attrib['k'] == 'addr:city':
-                        way_tag_dict['value'] = update_city(element)
-                    elif secondary.attrib["k"] == 'addr:state':
-                        way_tag_dict['value'] = update_state(element)
-                    else:
-                        way_tag_dict['value'] = secondary.attrib['v']
-                    tags.append(way_tag_dict)
-                    
-                else:
-                    way_tag_dict['key'] = secondary.attrib['k']
-                    way_tag_dict['value'] = secondary.attrib['v']
-                    way_tag_dict['type'] = 'regular'
-                    tags.append(way_tag_dict)
+                way_tag_dict = {}
+                way_tag_dict['id'] = element.attrib['id']
+                way_tag_dict['key'] = key
+                way_tag_dict['type'] = tag_type
+                
+                # Use cleaning rules (city/state) on way_tags
+                way_tag_dict['value'] = CLEANING_RULES.clean(secondary.attrib['k'],
+                                                             secondary.attrib['v'])
+                tags.append(way_tag_dict)
                 
         return {'way': way_attribs, 'way_nodes': way_nodes, 'way_tags': tags}
         # print {'way': way_attribs, 'way_nodes': way_nodes, 'way_tags': tags}
 
-        
-    
+
+    # Relation Fields
+    elif element.tag == 'relation':
+        relation_attribs = {}
+        for attrib in element.attrib:
+            if attrib in RELATION_FIELDS:
+                relation_attribs[attrib] = element.attrib[attrib]
+
+        # Secondary Element Attribs
+        for secondary in element:
+            if secondary.tag == 'tag':
+                tag_type, key, _ = classify_key(secondary.attrib['k'])
+
+                # Passing over problem characters
+                if key is None:
+                    continue
+
+                relation_tag_dict = {}
+                relation_tag_dict['id'] = element.attrib['id']
+                relation_tag_dict['key'] = key
+                relation_tag_dict['type'] = tag_type
+                relation_tag_dict['value'] = CLEANING_RULES.clean(secondary.attrib['k'],
+                                                                  secondary.attrib['v'])
+                tags.append(relation_tag_dict)
+
+        # Members are generated, not listed: read them before the next element
+        return {'relation': relation_attribs,
+                'relation_members': iter_relation_members(element),
+                'relation_tags': tags}
+
+
+def iter_relation_members(element):
+    """Yield a relation_members dict for each <member> of a relation element"""
+    position_count = 0
+    for secondary in element:
+        if secondary.tag == 'member':
+            yield {'id': element.attrib['id'],
+                   'member_id': secondary.attrib['ref'],
+                   'member_type': secondary.attrib['type'],
+                   'role': secondary.attrib.get('role', ''),
+                   'position': position_count}
+            position_count += 1
+
+
+def relation_member_rows(element):
+    """Yield a relation_members tuple, in RELATION_MEMBERS_FIELDS order, for
+    each <member> of a relation element"""
+    element_id = element.attrib['id']
+    position_count = 0
+    for secondary in element:
+        if secondary.tag == 'member':
+            attrib = secondary.attrib
+            yield (element_id, attrib['ref'], attrib['type'],
+                   _encode(attrib.get('role', '')), position_count)
+            position_count += 1
+
+
+def shape_rows(element, node_attr_fields=NODE_FIELDS, way_attr_fields=WAY_FIELDS,
+               problem_chars=PROBLEMCHARS, default_tag_type='regular',
+               relation_attr_fields=RELATION_FIELDS, classify=None):
+    """Shape node, way or relation XML element into utf-8 encoded, field
+    ordered tuples
+
+    Fast path for shape_element(): same values, but returned as
+    (row, tag_rows, way_node_rows) ready for csv.writer.writerows.
+    way_node_rows is empty for nodes; for relations it is a generator of the
+    relation_members rows (relation_member_rows), to be consumed before the
+    next element is read.
+
+    classify, a VegasKeys.KeyClassifier, replaces problem_chars and
+    default_tag_type; a caller shaping many elements can build it once with
+    key_classifier() and pass it down.
+    """
+    if element.tag == 'node':
+        attr_fields = node_attr_fields
+    elif element.tag == 'way':
+        attr_fields = way_attr_fields
+    elif element.tag == 'relation':
+        attr_fields = relation_attr_fields
+    else:
+        return None
+
+    clean = CLEANING_RULES.clean
+    if classify is None:
+        classify = key_classifier(problem_chars, default_tag_type)
+    attrib = element.attrib
+    element_id = attrib['id']
+    row = tuple([_encode(attrib.get(field, '')) for field in attr_fields])
+    tags = []
+    way_nodes = []
+
+    position_count = 0
+    for secondary in element:
+        if secondary.tag == 'nd':
+            if element.tag == 'way':
+                way_nodes.append((element_id, secondary.attrib['ref'], position_count))
+                position_count += 1
+
+        elif secondary.tag == 'tag':
+            k = secondary.attrib['k']
+            tag_type, key, _ = classify(k)
+
+            # Passing over problem characters
+            if key is None:
+                continue
+
+            tags.append((element_id, _encode(key), _encode(clean(k, secondary.attrib['v'])),
+                         _encode(tag_type)))
+
+    if element.tag == 'relation':
+        return row, tags, relation_member_rows(element)
+    return row, tags, way_nodes
+
 
 # ================================================== #
 #               Helper Functions                     #
 # ================================================== #
-def get_element(osm_file, tags=('node', 'way', 'relation')):
+def get_element(osm_file, tags=('node', 'way', 'relation'), backend=None):
     """Yield element if it is the right type of tag"""
+    return VegasStream.get_element(osm_file, tags, backend)
+
+
+def chunks(rows, size=MEMBER_CHUNK):
+    """Yield lists of up to size rows from any iterable"""
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
 
-    context = ET.iterparse(osm_file, events=('start', 'end'))
-    _, root = next(context)
-    for event, elem in context:
-        if event == 'end' and elem.tag in tags:
-            yield elem
-            root.clear()
+def _encode(value):
+    """Encode unicode values the way UnicodeDictWriter does"""
+    return value.encode('utf-8') if isinstance(value, unicode) else value
 
 
 def validate_element(element, validator, schema=SCHEMA):
@@ -225,34 +335,69 @@ class UnicodeDictWriter(csv.DictWriter, object):
 # ================================================== #
 #               Main Function                        #
 # ================================================== #
-def process_map(file_in, validate):
-    """Iteratively process each XML element and write to csv(s)"""
+def process_map(file_in, validate, fast=False, encoded=False, locations=None):
+    """Iteratively process each XML element and write to csv(s)
+
+    validate is True (every element), False, or a VegasValidate policy such
+    as ValidateEveryNth(100) or ValidateSample(10000); with validation on,
+    the policy's coverage statistics are returned.
+
+    fast=True writes shape_rows() tuples straight through csv.writer instead
+    of building a dict per row. The output is the same. Validation needs the
+    shape_element() dicts, so it always takes the dict path.
+
+    encoded=True writes the dictionary-encoded csv(s) and lookup tables of
+    process_map_encoded() instead. It is built on the fast path, so it can't
+    be combined with validation.
+
+    locations, a VegasNodes.NodeLocations store, is filled with each node's
+    coordinates along the way.
+    """
+    policy = VegasValidate.make_policy(validate)
+    if encoded:
+        if policy is not None:
+            raise ValueError('encoded output does not support validation')
+        return process_map_encoded(file_in, locations)
+    if fast and policy is None:
+        return process_map_rows(file_in, locations)
 
     with codecs.open(NODES_PATH, 'w') as nodes_file, \
          codecs.open(NODE_TAGS_PATH, 'w') as nodes_tags_file, \
          codecs.open(WAYS_PATH, 'w') as ways_file, \
          codecs.open(WAY_NODES_PATH, 'w') as way_nodes_file, \
-         codecs.open(WAY_TAGS_PATH, 'w') as way_tags_file:
+         codecs.open(WAY_TAGS_PATH, 'w') as way_tags_file, \
+         codecs.open(RELATIONS_PATH, 'w') as relations_file, \
+         codecs.open(RELATION_MEMBERS_PATH, 'w') as relation_members_file, \
+         codecs.open(RELATION_TAGS_PATH, 'w') as relation_tags_file:
 
         nodes_writer = UnicodeDictWriter(nodes_file, NODE_FIELDS)
         node_tags_writer = UnicodeDictWriter(nodes_tags_file, NODE_TAGS_FIELDS)
         ways_writer = UnicodeDictWriter(ways_file, WAY_FIELDS)
         way_nodes_writer = UnicodeDictWriter(way_nodes_file, WAY_NODES_FIELDS)
         way_tags_writer = UnicodeDictWriter(way_tags_file, WAY_TAGS_FIELDS)
+        relations_writer = UnicodeDictWriter(relations_file, RELATION_FIELDS)
+        relation_members_writer = UnicodeDictWriter(relation_members_file,
+                                                    RELATION_MEMBERS_FIELDS)
+        relation_tags_writer = UnicodeDictWriter(relation_tags_file, RELATION_TAGS_FIELDS)
 
         nodes_writer.writeheader()
         node_tags_writer.writeheader()
         ways_writer.writeheader()
         way_nodes_writer.writeheader()
         way_tags_writer.writeheader()
+        relations_writer.writeheader()
+        relation_members_writer.writeheader()
+        relation_tags_writer.writeheader()
 
-        validator = cerberus.Validator()
-
-        for element in get_element(file_in, tags=('node', 'way')):
+        for element in get_element(file_in, tags=('node', 'way', 'relation')):
+            if locations is not None:
+                locations.add_element(element)
             el = shape_element(element)
             if el:
-                if validate is True:
-                    validate_element(el, validator)
+                # Relation members are validated and written a chunk at a time
+                members = el.pop('relation_members', ())
+                if policy is not None:
+                    policy.check(el)
 
                 if element.tag == 'node':
                     nodes_writer.writerow(el['node'])
@@ -261,11 +406,138 @@ def process_map(file_in, validate):
                     ways_writer.writerow(el['way'])
                     way_nodes_writer.writerows(el['way_nodes'])
                     way_tags_writer.writerows(el['way_tags'])
+                elif element.tag == 'relation':
+                    relations_writer.writerow(el['relation'])
+                    relation_tags_writer.writerows(el['relation_tags'])
+                    for chunk in chunks(members):
+                        if policy is not None:
+                            policy.check_part({'relation_members': chunk})
+                        relation_members_writer.writerows(chunk)
+
+    if locations is not None:
+        locations.finish()
+    if policy is not None:
+        return policy.finish()
+
+
+def process_map_rows(file_in, locations=None):
+    """Iteratively process each XML element and write shape_rows() tuples to csv(s)"""
+
+    with codecs.open(NODES_PATH, 'w') as nodes_file, \
+         codecs.open(NODE_TAGS_PATH, 'w') as nodes_tags_file, \
+         codecs.open(WAYS_PATH, 'w') as ways_file, \
+         codecs.open(WAY_NODES_PATH, 'w') as way_nodes_file, \
+         codecs.open(WAY_TAGS_PATH, 'w') as way_tags_file, \
+         codecs.open(RELATIONS_PATH, 'w') as relations_file, \
+         codecs.open(RELATION_MEMBERS_PATH, 'w') as relation_members_file, \
+         codecs.open(RELATION_TAGS_PATH, 'w') as relation_tags_file:
+
+        nodes_writer = csv.writer(nodes_file)
+        node_tags_writer = csv.writer(nodes_tags_file)
+        ways_writer = csv.writer(ways_file)
+        way_nodes_writer = csv.writer(way_nodes_file)
+        way_tags_writer = csv.writer(way_tags_file)
+        relations_writer = csv.writer(relations_file)
+        relation_members_writer = csv.writer(relation_members_file)
+        relation_tags_writer = csv.writer(relation_tags_file)
+
+        nodes_writer.writerow(NODE_FIELDS)
+        node_tags_writer.writerow(NODE_TAGS_FIELDS)
+        ways_writer.writerow(WAY_FIELDS)
+        way_nodes_writer.writerow(WAY_NODES_FIELDS)
+        way_tags_writer.writerow(WAY_TAGS_FIELDS)
+        relations_writer.writerow(RELATION_FIELDS)
+        relation_members_writer.writerow(RELATION_MEMBERS_FIELDS)
+        relation_tags_writer.writerow(RELATION_TAGS_FIELDS)
+
+        for element in get_element(file_in, tags=('node', 'way', 'relation')):
+            if locations is not None:
+                locations.add_element(element)
+            row, tags, way_nodes = shape_rows(element)
+            if element.tag == 'node':
+                nodes_writer.writerow(row)
+                node_tags_writer.writerows(tags)
+            elif element.tag == 'way':
+                ways_writer.writerow(row)
+                way_nodes_writer.writerows(way_nodes)
+                way_tags_writer.writerows(tags)
+            else:
+                relations_writer.writerow(row)
+                relation_members_writer.writerows(way_nodes)
+                relation_tags_writer.writerows(tags)
+
+    if locations is not None:
+        locations.finish()
+
+
+def process_map_encoded(file_in, locations=None):
+    """Write shape_rows() tuples with integer codes for keys, values and users
+
+    The code -> string lookup tables are written once every element is in.
+    Returns the number of distinct strings in each lookup table.
+    """
+    encoder = VegasEncode.Encoder()
+
+    with codecs.open(ENCODED_NODES_PATH, 'w') as nodes_file, \
+         codecs.open(ENCODED_NODE_TAGS_PATH, 'w') as nodes_tags_file, \
+         codecs.open(ENCODED_WAYS_PATH, 'w') as ways_file, \
+         codecs.open(WAY_NODES_PATH, 'w') as way_nodes_file, \
+         codecs.open(ENCODED_WAY_TAGS_PATH, 'w') as way_tags_file, \
+         codecs.open(ENCODED_RELATIONS_PATH, 'w') as relations_file, \
+         codecs.open(RELATION_MEMBERS_PATH, 'w') as relation_members_file, \
+         codecs.open(ENCODED_RELATION_TAGS_PATH, 'w') as relation_tags_file:
+
+        nodes_writer = csv.writer(nodes_file)
+        node_tags_writer = csv.writer(nodes_tags_file)
+        ways_writer = csv.writer(ways_file)
+        way_nodes_writer = csv.writer(way_nodes_file)
+        way_tags_writer = csv.writer(way_tags_file)
+        relations_writer = csv.writer(relations_file)
+        relation_members_writer = csv.writer(relation_members_file)
+        relation_tags_writer = csv.writer(relation_tags_file)
+
+        nodes_writer.writerow(VegasEncode.NODE_FIELDS)
+        node_tags_writer.writerow(VegasEncode.NODE_TAGS_FIELDS)
+        ways_writer.writerow(VegasEncode.WAY_FIELDS)
+        way_nodes_writer.writerow(WAY_NODES_FIELDS)
+        way_tags_writer.writerow(VegasEncode.WAY_TAGS_FIELDS)
+        relations_writer.writerow(VegasEncode.RELATION_FIELDS)
+        relation_members_writer.writerow(RELATION_MEMBERS_FIELDS)
+        relation_tags_writer.writerow(VegasEncode.RELATION_TAGS_FIELDS)
+
+        for element in get_element(file_in, tags=('node', 'way', 'relation')):
+            if locations is not None:
+                locations.add_element(element)
+            row, tags, way_nodes = shape_rows(element)
+            if element.tag == 'node':
+                nodes_writer.writerow(encoder.node(row))
+                node_tags_writer.writerows(encoder.tags(tags))
+            elif element.tag == 'way':
+                ways_writer.writerow(encoder.way(row))
+                way_nodes_writer.writerows(way_nodes)
+                way_tags_writer.writerows(encoder.tags(tags))
+            else:
+                relations_writer.writerow(encoder.relation(row))
+                relation_members_writer.writerows(way_nodes)
+                relation_tags_writer.writerows(encoder.tags(tags))
+
+    if locations is not None:
+        locations.finish()
+    sizes = {}
+    for table, fields, rows in encoder.lookups():
+        with codecs.open(LOOKUP_PATHS[table], 'w') as lookup_file:
+            writer = csv.writer(lookup_file)
+            writer.writerow(fields)
+            writer.writerows(rows)
+        sizes[table] = len(rows)
+    return sizes
 
 
 if __name__ == '__main__':
-    # Note: Validation is ~ 10X slower. For the project consider using a small
-    # sample of the map when validating.
-    process_map(SAMPLE, validate=True)
+    # Note: cerberus validation alone is ~ 10X slower. VegasValidate only falls
+    # back to cerberus for elements that fail its compiled checks.
+    pprint.pprint(process_map(SAMPLE, validate=True))
+    # Which cleaning rules fired, and how often
+    pprint.pprint(CLEANING_RULES.report())
 
 
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+'''
+Re-run VegasData on a newer extract and only write what changed:
+- Keep a fingerprint (version, changeset) per node/way/relation in a small sqlite
+  store next to the .csv files. OSM bumps the version on every edit, so
+  an element with the same fingerprint as last run is unchanged. Extracts
+  stripped of their metadata have no version/changeset; their elements are
+  fingerprinted by a hash of their attributes and children instead.
+- Skip unchanged elements before shaping them, and write the new/changed
+  ones to delta_*.csv files
+- List elements missing from the new extract in delta_deleted.csv
+- Validate the new/changed elements with the same policies as
+  VegasData.process_map (validate=...)
+- Report how many elements were skipped (the hit rate)
+
+The fingerprint only covers the OSM file: after editing cleaning_rules.json,
+delete fingerprints.db so every element is shaped (and cleaned) again.
+'''
+
+import codecs
+import csv
+import hashlib
+import pprint
+import sqlite3
+import struct
+
+import VegasData
+import VegasValidate
+from VegasData import (NODE_FIELDS, NODE_TAGS_FIELDS, WAY_FIELDS,
+                       WAY_TAGS_FIELDS, WAY_NODES_FIELDS, RELATION_FIELDS,
+                       RELATION_MEMBERS_FIELDS, RELATION_TAGS_FIELDS,
+                       UnicodeDictWriter)
+
+FINGERPRINTS_DB = 'fingerprints.db'
+
+DELTA_NODES_PATH = 'delta_nodes.csv'
+DELTA_NODE_TAGS_PATH = 'delta_nodes_tags.csv'
+DELTA_WAYS_PATH = 'delta_ways.csv'
+DELTA_WAY_NODES_PATH = 'delta_ways_nodes.csv'
+DELTA_WAY_TAGS_PATH = 'delta_ways_tags.csv'
+DELTA_RELATIONS_PATH = 'delta_relations.csv'
+DELTA_RELATION_MEMBERS_PATH = 'delta_relations_members.csv'
+DELTA_RELATION_TAGS_PATH = 'delta_relations_tags.csv'
+DELTA_DELETED_PATH = 'delta_deleted.csv'
+
+# Fingerprint rows written per executemany
+BATCH_SIZE = 10000
+
+# Version stored with a content hash (in the changeset column)
+HASHED = -1
+
+
+def open_store(db_path=FINGERPRINTS_DB):
+    """Open (creating if needed) the fingerprint store"""
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('''CREATE TABLE IF NOT EXISTS fingerprints (
+        type TEXT NOT NULL,
+        id INTEGER NOT NULL,
+        version INTEGER NOT NULL,
+        changeset INTEGER NOT NULL,
+        run INTEGER NOT NULL,
+        PRIMARY KEY (type, id)
+    ) WITHOUT ROWID''')
+    return conn
+
+
+def fingerprint(element):
+    """Return (version, changeset) of an element, or (HASHED, content hash)
+    when the file doesn't carry them"""
+    attrib = element.attrib
+    if 'version' in attrib and 'changeset' in attrib:
+        return int(attrib['version']), int(attrib['changeset'])
+    digest = hashlib.md5()
+    for part in [element] + list(element):
+        fields = [part.tag] + [u'%s=%s' % item for item in sorted(part.attrib.items())]
+        digest.update(u'\0'.join(fields).encode('utf-8') + '\n')
+    # First 8 bytes as a signed int, to fit sqlite's INTEGER
+    return HASHED, struct.unpack('<q', digest.digest()[:8])[0]
+
+
+def process_map_delta(file_in, db_path=FINGERPRINTS_DB, validate=False):
+    """Write delta csv(s) for elements that changed since the last run
+
+    Returns the counts of new, changed, unchanged and deleted elements and
+    the hit rate (share of elements skipped as unchanged). validate is as
+    for VegasData.process_map and only sees the new and changed elements;
+    with validation on, the policy's statistics are returned as well. An
+    invalid element raises before the fingerprints are saved.
+    """
+    policy = VegasValidate.make_policy(validate)
+    store = open_store(db_path)
+    run = store.execute('SELECT COALESCE(MAX(run), 0) + 1 FROM fingerprints').fetchone()[0]
+    lookup = 'SELECT version, changeset FROM fingerprints WHERE type = ? AND id = ?'
+    upsert = '''INSERT OR REPLACE INTO fingerprints (type, id, version, changeset, run)
+                VALUES (?, ?, ?, ?, ?)'''
+    touch = 'UPDATE fingerprints SET run = ? WHERE type = ? AND id = ?'
+
+    stats = {'new': 0, 'changed': 0, 'unchanged': 0, 'deleted': 0}
+    changed = []
+    unchanged = []
+
+    def flush():
+        store.executemany(upsert, changed)
+        store.executemany(touch, unchanged)
+        del changed[:]
+        del unchanged[:]
+
+    with codecs.open(DELTA_NODES_PATH, 'w') as nodes_file, \
+         codecs.open(DELTA_NODE_TAGS_PATH, 'w') as nodes_tags_file, \
+         codecs.open(DELTA_WAYS_PATH, 'w') as ways_file, \
+         codecs.open(DELTA_WAY_NODES_PATH, 'w') as way_nodes_file, \
+         codecs.open(DELTA_WAY_TAGS_PATH, 'w') as way_tags_file, \
+         codecs.open(DELTA_RELATIONS_PATH, 'w') as relations_file, \
+         codecs.open(DELTA_RELATION_MEMBERS_PATH, 'w') as relation_members_file, \
+         codecs.open(DELTA_RELATION_TAGS_PATH, 'w') as relation_tags_file, \
+         codecs.open(DELTA_DELETED_PATH, 'w') as deleted_file:
+
+        def writer(f, fields):
+            # Validation needs shape_element()'s dicts, as in process_map
+            if policy is None:
+                w = csv.writer(f)
+                w.writerow(fields)
+            else:
+                w = UnicodeDictWriter(f, fields)
+                w.writeheader()
+            return w
+
+        nodes_writer = writer(nodes_file, NODE_FIELDS)
+        node_tags_writer = writer(nodes_tags_file, NODE_TAGS_FIELDS)
+        ways_writer = writer(ways_file, WAY_FIELDS)
+        way_nodes_writer = writer(way_nodes_file, WAY_NODES_FIELDS)
+        way_tags_writer = writer(way_tags_file, WAY_TAGS_FIELDS)
+        relations_writer = writer(relations_file, RELATION_FIELDS)
+        relation_members_writer = writer(relation_members_file, RELATION_MEMBERS_FIELDS)
+        relation_tags_writer = writer(relation_tags_file, RELATION_TAGS_FIELDS)
+        deleted_writer = csv.writer(deleted_file)
+        deleted_writer.writerow(['type', 'id'])
+
+        for element in VegasData.get_element(file_in, tags=('node', 'way', 'relation')):
+            key = (element.tag, int(element.attrib['id']))
+            new = fingerprint(element)
+
+            old = store.execute(lookup, key).fetchone()
+            if old == new:
+                stats['unchanged'] += 1
+                unchanged.append((run,) + key)
+            else:
+                stats['new' if old is None else 'changed'] += 1
+                changed.append(key + new + (run,))
+
+                if policy is not None:
+                    el = VegasData.shape_element(element)
+                    members = el.pop('relation_members', ())
+                    policy.check(el)
+                    if element.tag == 'node':
+                        nodes_writer.writerow(el['node'])
+                        node_tags_writer.writerows(el['node_tags'])
+                    elif element.tag == 'way':
+                        ways_writer.writerow(el['way'])
+                        way_nodes_writer.writerows(el['way_nodes'])
+                        way_tags_writer.writerows(el['way_tags'])
+                    else:
+                        relations_writer.writerow(el['relation'])
+                        relation_tags_writer.writerows(el['relation_tags'])
+                        for chunk in VegasData.chunks(members):
+                            policy.check_part({'relation_members': chunk})
+                            relation_members_writer.writerows(chunk)
+                else:
+                    row, tags, way_nodes = VegasData.shape_rows(element)
+                    if element.tag == 'node':
+                        nodes_writer.writerow(row)
+                        node_tags_writer.writerows(tags)
+                    elif element.tag == 'way':
+                        ways_writer.writerow(row)
+                        way_nodes_writer.writerows(way_nodes)
+                        way_tags_writer.writerows(tags)
+                    else:
+                        relations_writer.writerow(row)
+                        relation_members_writer.writerows(way_nodes)
+                        relation_tags_writer.writerows(tags)
+
+            if len(changed) + len(unchanged) >= BATCH_SIZE:
+                flush()
+        flush()
+
+        # Anything not seen in this run is gone from the extract
+        for row in store.execute('SELECT type, id FROM fingerprints WHERE run < ?', (run,)):
+            deleted_writer.writerow(row)
+            stats['deleted'] += 1
+        store.execute('DELETE FROM fingerprints WHERE run < ?', (run,))
+
+    # Raises on an invalid element, before the fingerprints are saved
+    if policy is not None:
+        stats['validation'] = policy.finish()
+    store.commit()
+    store.close()
+
+    seen = stats['new'] + stats['changed'] + stats['unchanged']
+    stats['hit_rate'] = float(stats['unchanged']) / seen if seen else 0.0
+    return stats
+
+
+if __name__ == '__main__':
+    pprint.pprint(process_map_delta(VegasData.OSM_PATH))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+'''
+Dictionary encoding for the repetitive text columns:
+- Tag keys ("highway", "name", "building"), tag values ("residential",
+  "yes") and user names repeat across millions of rows
+- Give each distinct string an integer code, in the order first seen
+- Write the codes in the tag/node/way rows and the strings once, in the
+  tag_keys, tag_values and users lookup tables
+- The tag type ("regular", "addr", "tiger", ...) is a key prefix, so it is
+  coded with the tag keys
+
+Used by VegasData.process_map(encoded=True) for the .csv files and by
+SQLencode.py for the SQL database. The dictionaries stay in memory until the
+lookup tables are written, one entry per distinct string.
+'''
+
+# Column order of the encoded csv(s)/tables. ways_nodes and relations_members
+# are written as is.
+NODE_FIELDS = ['id', 'lat', 'lon', 'user_id', 'uid', 'version', 'changeset', 'timestamp']
+NODE_TAGS_FIELDS = ['id', 'key_id', 'value_id', 'type_id']
+WAY_FIELDS = ['id', 'user_id', 'uid', 'version', 'changeset', 'timestamp']
+WAY_TAGS_FIELDS = ['id', 'key_id', 'value_id', 'type_id']
+RELATION_FIELDS = ['id', 'user_id', 'uid', 'version', 'changeset', 'timestamp']
+RELATION_TAGS_FIELDS = ['id', 'key_id', 'value_id', 'type_id']
+
+TAG_KEYS_FIELDS = ['id', 'key']
+TAG_VALUES_FIELDS = ['id', 'value']
+USERS_FIELDS = ['id', 'user']
+
+# Position of the user column in VegasData.shape_rows() node/way/relation rows
+NODE_USER = 3
+WAY_USER = 1
+RELATION_USER = 1
+
+
+class Dictionary(dict):
+    """Map each distinct string to an integer code, starting at 1
+
+    dictionary[value] returns the code of value, giving it the next code the
+    first time it is seen. Lookups of known strings never leave C.
+    """
+
+    def __missing__(self, value):
+        code = self[value] = len(self) + 1
+        return code
+
+    def rows(self):
+        """Return (code, string) rows in code order"""
+        return sorted(((code, value) for value, code in self.iteritems()))
+
+
+class Encoder(object):
+    """Encode VegasData.shape_rows() tuples with shared key/value/user codes"""
+
+    def __init__(self):
+        self.keys = Dictionary()
+        self.values = Dictionary()
+        self.users = Dictionary()
+
+    def node(self, row):
+        return row[:NODE_USER] + (self.users[row[NODE_USER]],) + row[NODE_USER + 1:]
+
+    def way(self, row):
+        return row[:WAY_USER] + (self.users[row[WAY_USER]],) + row[WAY_USER + 1:]
+
+    def relation(self, row):
+        return row[:RELATION_USER] + (self.users[row[RELATION_USER]],) + row[RELATION_USER + 1:]
+
+    def tags(self, tags):
+        keys = self.keys
+        values = self.values
+        return [(element_id, keys[key], values[value], keys[tag_type])
+                for element_id, key, value, tag_type in tags]
+
+    def lookups(self):
+        """Return (table, fields, rows) for each lookup table"""
+        return [('tag_keys', TAG_KEYS_FIELDS, self.keys.rows()),
+                ('tag_values', TAG_VALUES_FIELDS, self.values.rows()),
+                ('users', USERS_FIELDS, self.users.rows())]
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+'''
+Random access into the OSM file, so looking at one node or way doesn't mean
+reading the file from the start:
+- build_index() makes one VegasStream.element_spans() pass and stores
+  (type, id) -> (offset, length) of every node, way and relation in a
+  sqlite sidecar next to the OSM file (las-vegas_nevada.osm.idx)
+- The sidecar remembers the OSM file's size and modification time;
+  OffsetIndex refuses a stale one, open_index() rebuilds it
+- OffsetIndex.fetch() / fetch_many() memory-map the OSM file and parse only
+  the requested elements' bytes. The elements are ElementTree elements, so
+  VegasData.shape_element() and the audit code take them as they are.
+'''
+
+import os
+import sqlite3
+import sys
+
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+import VegasData
+from VegasStream import element_spans, open_mapped, span_id
+
+INDEX_SUFFIX = '.idx'
+
+# Offset rows written per executemany
+BATCH_SIZE = 10000
+
+
+def index_path_for(osm_path):
+    return osm_path + INDEX_SUFFIX
+
+
+def file_stamp(osm_path):
+    """(size, mtime) of the OSM file, to tell whether an index is current"""
+    stat = os.stat(osm_path)
+    return stat.st_size, int(stat.st_mtime)
+
+
+def build_index(osm_path, index_path=None):
+    """Index the offset and length of every element of osm_path
+
+    Returns the number of elements indexed. An existing index is replaced.
+    """
+    index_path = index_path or index_path_for(osm_path)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+    conn = sqlite3.connect(index_path)
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('''CREATE TABLE offsets (
+        type TEXT NOT NULL,
+        id INTEGER NOT NULL,
+        offset INTEGER NOT NULL,
+        length INTEGER NOT NULL,
+        PRIMARY KEY (type, id)
+    ) WITHOUT ROWID''')
+    conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value INTEGER)')
+
+    insert = 'INSERT OR REPLACE INTO offsets (type, id, offset, length) VALUES (?, ?, ?, ?)'
+    count = 0
+    batch = []
+    data = open_mapped(osm_path)
+    try:
+        for tag, start, end in element_spans(data):
+            batch.append((tag, span_id(data, start, end), start, end - start))
+            if len(batch) >= BATCH_SIZE:
+                conn.executemany(insert, batch)
+                count += len(batch)
+                batch = []
+        conn.executemany(insert, batch)
+        count += len(batch)
+    finally:
+        data.close()
+
+    size, mtime = file_stamp(osm_path)
+    conn.executemany('INSERT INTO meta (key, value) VALUES (?, ?)',
+                     [('size', size), ('mtime', mtime), ('elements', count)])
+    conn.commit()
+    conn.close()
+    return count
+
+
+class OffsetIndex(object):
+    """Fetch single elements of an OSM file through its offset index"""
+
+    def __init__(self, osm_path, index_path=None):
+        index_path = index_path or index_path_for(osm_path)
+        if not os.path.exists(index_path):
+            raise IOError('No offset index at {0}: run build_index() first'.format(index_path))
+        self.conn = sqlite3.connect(index_path)
+        meta = dict(self.conn.execute('SELECT key, value FROM meta'))
+        if (meta.get('size'), meta.get('mtime')) != file_stamp(osm_path):
+            self.conn.close()
+            raise ValueError('Offset index {0} is out of date with {1}: rebuild it'.format(
+                index_path, osm_path))
+        self.data = open_mapped(osm_path)
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM offsets').fetchone()[0]
+
+    def close(self):
+        self.data.close()
+        self.conn.close()
+
+    def locate(self, element_type, element_id):
+        """Return (offset, length) of an element, None if it isn't in the file"""
+        return self.conn.execute('SELECT offset, length FROM offsets WHERE type = ? AND id = ?',
+                                 (element_type, int(element_id))).fetchone()
+
+    def raw(self, element_type, element_id):
+        """Return the element's source bytes, None if it isn't in the file"""
+        found = self.locate(element_type, element_id)
+        if found is None:
+            return None
+        offset, length = found
+        return self.data[offset:offset + length]
+
+    def fetch(self, element_type, element_id):
+        """Return the parsed element, None if it isn't in the file"""
+        raw = self.raw(element_type, element_id)
+        return None if raw is None else ET.fromstring(raw)
+
+    def fetch_many(self, keys):
+        """Yield (type, id, element) for each (type, id) in keys found in the file
+
+        The elements are read in file order, not in the order of keys, so a
+        long list walks the mapped file front to back.
+        """
+        found = []
+        for element_type, element_id in keys:
+            location = self.locate(element_type, element_id)
+            if location is not None:
+                found.append((location, element_type, int(element_id)))
+        found.sort()
+        for (offset, length), element_type, element_id in found:
+            yield element_type, element_id, ET.fromstring(self.data[offset:offset + length])
+
+
+def open_index(osm_path, index_path=None):
+    """Return an OffsetIndex for osm_path, (re)building it if needed"""
+    try:
+        return OffsetIndex(osm_path, index_path)
+    except (IOError, ValueError):
+        build_index(osm_path, index_path)
+        return OffsetIndex(osm_path, index_path)
+
+
+if __name__ == '__main__':
+    # Usage: python VegasIndex.py [osm file]        -- build the index
+    #        python VegasIndex.py osm_file way 1234  -- print one element
+    osm_path = sys.argv[1] if len(sys.argv) > 1 else VegasData.OSM_PATH
+    if len(sys.argv) > 3:
+        index = open_index(osm_path)
+        raw = index.raw(sys.argv[2], sys.argv[3])
+        index.close()
+        print(raw.decode('utf-8') if raw is not None else 'not found')
+    else:
+        print('{0} elements indexed'.format(build_index(osm_path)))
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+# Shared tag key classification. An OSM file has a few thousand distinct tag
+# keys but millions of tags, so each key is run through the regexes once and
+# the answer is cached:
+#   (tag_type, key, key_class)
+# tag_type/key are what shape_element writes to the tags csv(s) (key is None
+# when the key has problem characters and the tag is skipped), key_class is
+# the VegasTagTypes category: lower, lower_colon, problemchars or other.
+
+import re
+
+# Used by VegasData.shape_element
+LOWER_COLON = re.compile(r'^([a-z]|_)+:([a-z]|_)+')
+PROBLEMCHARS = re.compile(r'[=\+/&<>;\'"\?%#$@\,\. \t\r\n]')
+
+# Used by VegasTagTypes.key_type
+LOWER = re.compile(r'^([a-z]|_)*$')
+LOWER_COLON_ONLY = re.compile(r'^([a-z]|_)*:([a-z]|_)*$')
+
+# Stop caching past this many distinct keys, in case a file is full of junk
+MAX_KEYS = 100000
+
+
+class KeyClassifier(object):
+    """Resolve tag keys to (tag_type, key, key_class), once per distinct key"""
+
+    def __init__(self, problem_chars=PROBLEMCHARS, default_tag_type='regular'):
+        self.problem_chars = problem_chars
+        self.default_tag_type = default_tag_type
+        self.cache = {}
+
+    def classify(self, k):
+        try:
+            return self.cache[k]
+        except KeyError:
+            pass
+
+        # Same tests, in the same order, as shape_element ...
+        if self.problem_chars.match(k):
+            tag_type, key = None, None
+        elif LOWER_COLON.match(k):
+            tag_type, key = k.split(':', 1)
+        else:
+            tag_type, key = self.default_tag_type, k
+
+        # ... and as VegasTagTypes.key_type
+        if LOWER.search(k):
+            key_class = 'lower'
+        elif LOWER_COLON_ONLY.search(k):
+            key_class = 'lower_colon'
+        elif PROBLEMCHARS.search(k):
+            key_class = 'problemchars'
+        else:
+            key_class = 'other'
+
+        result = (tag_type, key, key_class)
+        if len(self.cache) < MAX_KEYS:
+            self.cache[k] = result
+        return result
+
+    __call__ = classify
+
+
+classify_key = KeyClassifier()
@@ -6,8 +6,8 @@ Data Wrangling Project
 By: Kyle Campbell
 """
 
-import xml.etree.cElementTree as ET
 import pprint
+from VegasStream import ElementStream
 
 OSM = 'las-vegas_nevada.osm'
 
@@ -16,13 +16,18 @@ OSM = 'las-vegas_nevada.osm'
 
 def count_tags(filename):
     tags = {}
-    for event, element in ET.iterparse(filename):
-        if element.tag in tags: 
-            tags[element.tag] += 1
-        else:
-            tags[element.tag] = 1
+    stream = ElementStream(filename)
+    for top in stream:
+        for element in top.iter():
+            if element.tag in tags: 
+                tags[element.tag] += 1
+            else:
+                tags[element.tag] = 1
+    if stream.root is not None:
+        tags[stream.root.tag] = 1
     return tags
 
 
-pprint.pprint(count_tags(OSM))
+if __name__ == '__main__':
+    pprint.pprint(count_tags(OSM))
 
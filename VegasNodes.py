@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+'''
+Node location store, to turn ways_nodes back into way geometries without
+joining ways_nodes to nodes in SQL:
+- While the nodes stream by, append each id (int64) and lat/lon (int32,
+  fixed point at 1e-7 degrees, the precision of the OSM file) to two flat
+  files: 16 bytes per node
+- Ways come after the nodes in an OSM file, so at the first way the files
+  are memory-mapped (and sorted by id, if they weren't)
+- Resolve a way's node refs to a (lat, lon) array with one binary search
+  (numpy.searchsorted) over the mapped ids; nodes missing from the file,
+  as in the samples, come back as NaN
+
+VegasData.process_map(locations=...) fills a store during the normal .csv
+run; way_geometries() streams the OSM file once and yields each way with
+its coordinates. Needs numpy.
+'''
+
+import csv
+import os
+
+import VegasData
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NODE_STORE_PATH = 'node_locations'
+WAY_GEOMETRY_PATH = 'ways_geometry.csv'
+
+# lat/lon are stored as round(degrees * SCALE) in an int32
+SCALE = 10000000
+
+# Nodes buffered before they are appended to the store files
+BATCH_SIZE = 100000
+
+
+class NodeLocations(object):
+    """Append-then-lookup store of node id -> (lat, lon)
+
+    Files: <path>.ids (sorted int64 ids) and <path>.coords (int32 lat, lon
+    pairs in the same order).
+    """
+
+    def __init__(self, path=NODE_STORE_PATH):
+        if np is None:
+            raise ImportError('the node location store needs numpy: pip install numpy')
+        self.path = path
+        self.ids_path = path + '.ids'
+        self.coords_path = path + '.coords'
+        self.ids = None
+        self.coords = None
+        self._ids_file = None
+        self._coords_file = None
+        self._ids_batch = []
+        self._coords_batch = []
+
+    @classmethod
+    def open(cls, path=NODE_STORE_PATH):
+        """Open a store written earlier for lookups"""
+        store = cls(path)
+        store._map()
+        return store
+
+    def __len__(self):
+        if self.ids is not None:
+            return len(self.ids)
+        count = len(self._ids_batch)
+        if self._ids_file is not None:
+            count += self._ids_file.tell() // 8
+        return count
+
+    # -------------------- writing -------------------- #
+
+    def add(self, node_id, lat, lon):
+        if self.ids is not None:
+            # The files are mapped for lookups now; reopening them to write
+            # would truncate them under the mapping
+            raise ValueError('node {0} after the first way: nodes must precede ways '
+                             'in the OSM file'.format(node_id))
+        if self._ids_file is None:
+            self._ids_file = open(self.ids_path, 'wb')
+            self._coords_file = open(self.coords_path, 'wb')
+        self._ids_batch.append(int(node_id))
+        self._coords_batch.append((int(round(float(lat) * SCALE)),
+                                   int(round(float(lon) * SCALE))))
+        if len(self._ids_batch) >= BATCH_SIZE:
+            self._flush()
+
+    def add_element(self, element):
+        """Add a node element; the first way element finishes the store, and
+        a node after it raises ValueError"""
+        if element.tag == 'node':
+            attrib = element.attrib
+            self.add(attrib['id'], attrib['lat'], attrib['lon'])
+        elif self.ids is None:
+            self.finish()
+
+    def _flush(self):
+        np.array(self._ids_batch, dtype=np.int64).tofile(self._ids_file)
+        np.array(self._coords_batch, dtype=np.int32).reshape(-1, 2).tofile(self._coords_file)
+        self._ids_batch = []
+        self._coords_batch = []
+
+    def finish(self):
+        """Write out the buffered nodes and map the store for lookups"""
+        if self.ids is not None:
+            return
+        if self._ids_file is None:
+            # No nodes at all: still leave a valid, empty store behind
+            open(self.ids_path, 'wb').close()
+            open(self.coords_path, 'wb').close()
+        else:
+            self._flush()
+            self._ids_file.close()
+            self._coords_file.close()
+            self._ids_file = self._coords_file = None
+        self._sort()
+        self._map()
+
+    def _sort(self):
+        """Sort the store by id; OSM extracts are sorted already"""
+        ids = np.fromfile(self.ids_path, dtype=np.int64)
+        if len(ids) < 2 or (ids[1:] > ids[:-1]).all():
+            return
+        order = np.argsort(ids, kind='mergesort')
+        ids[order].tofile(self.ids_path)
+        coords = np.fromfile(self.coords_path, dtype=np.int32).reshape(-1, 2)
+        coords[order].tofile(self.coords_path)
+
+    def _map(self):
+        if os.path.getsize(self.ids_path) == 0:
+            self.ids = np.zeros(0, dtype=np.int64)
+            self.coords = np.zeros((0, 2), dtype=np.int32)
+            return
+        self.ids = np.memmap(self.ids_path, dtype=np.int64, mode='r')
+        self.coords = np.memmap(self.coords_path, dtype=np.int32, mode='r').reshape(-1, 2)
+
+    # -------------------- lookups -------------------- #
+
+    def lookup(self, node_ids):
+        """Return an (n, 2) float array of (lat, lon), NaN for unknown ids"""
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        result = np.full((len(node_ids), 2), np.nan)
+        if len(self.ids) == 0:
+            return result
+        index = np.searchsorted(self.ids, node_ids)
+        index[index == len(self.ids)] = 0
+        found = self.ids[index] == node_ids
+        result[found] = self.coords[index[found]] / float(SCALE)
+        return result
+
+    def way_coords(self, element):
+        """Return the (lat, lon) array of a way element's nodes, in order"""
+        return self.lookup([int(nd.attrib['ref']) for nd in element.iter('nd')])
+
+
+# ================================================== #
+#               Main Functions                       #
+# ================================================== #
+def way_geometries(file_in, path=NODE_STORE_PATH):
+    """Yield (way id, (lat, lon) array) for each way, in one pass over file_in
+
+    Fills the node store at path on the way.
+    """
+    store = NodeLocations(path)
+    for element in VegasData.get_element(file_in, tags=('node', 'way')):
+        store.add_element(element)
+        if element.tag == 'way':
+            yield element.attrib['id'], store.way_coords(element)
+    store.finish()
+
+
+def linestring(coords):
+    """Well-known text for a way, or '' if any of its nodes is unknown"""
+    if len(coords) < 2 or np.isnan(coords).any():
+        return ''
+    return 'LINESTRING ({0})'.format(
+        ', '.join('{0:.7f} {1:.7f}'.format(lon, lat) for lat, lon in coords))
+
+
+def write_way_geometries(file_in, file_out=WAY_GEOMETRY_PATH, path=NODE_STORE_PATH):
+    """Write each way id and its geometry (WKT, lon lat order) to a .csv file"""
+    with open(file_out, 'wb') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'geometry'])
+        for way_id, coords in way_geometries(file_in, path):
+            writer.writerow([way_id, linestring(coords)])
+
+
+if __name__ == '__main__':
+    write_way_geometries(VegasData.OSM_PATH)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+'''
+Process-pool version of VegasData.process_map:
+- Split the OSM file into byte ranges that start on a top level <node>, <way>
+  or <relation> tag
+- Shape (and optionally validate) each range in a worker process, writing
+  its rows to a set of temporary .csv files
+- Append the temporary files to the final .csv files in file order, so the
+  output is identical to a single process run
+- Each worker gets a copy of the validation policy and cleans with its own
+  copy of the cleaning rules; their statistics and rule hits are added up
+  in the parent, so process_map's return value and CLEANING_RULES.report()
+  mean the same here. Per-element choices (EveryNth, Sample) are made per
+  range.
+'''
+
+import codecs
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+from cStringIO import StringIO
+
+import VegasData
+import VegasValidate
+from VegasData import (NODES_PATH, NODE_TAGS_PATH, WAYS_PATH, WAY_NODES_PATH,
+                       WAY_TAGS_PATH, RELATIONS_PATH, RELATION_MEMBERS_PATH,
+                       RELATION_TAGS_PATH, NODE_FIELDS, NODE_TAGS_FIELDS, WAY_FIELDS,
+                       WAY_TAGS_FIELDS, WAY_NODES_FIELDS, RELATION_FIELDS,
+                       RELATION_MEMBERS_FIELDS, RELATION_TAGS_FIELDS,
+                       UnicodeDictWriter)
+
+# Output files and their fields, in the order the workers write them
+OUTPUTS = [(NODES_PATH, NODE_FIELDS),
+           (NODE_TAGS_PATH, NODE_TAGS_FIELDS),
+           (WAYS_PATH, WAY_FIELDS),
+           (WAY_NODES_PATH, WAY_NODES_FIELDS),
+           (WAY_TAGS_PATH, WAY_TAGS_FIELDS),
+           (RELATIONS_PATH, RELATION_FIELDS),
+           (RELATION_MEMBERS_PATH, RELATION_MEMBERS_FIELDS),
+           (RELATION_TAGS_PATH, RELATION_TAGS_FIELDS)]
+
+# Opening tag of a top level element. Attribute values can't hold a raw '<',
+# and <nd>/<member> don't match, so this only hits top level elements.
+TOP_LEVEL_START = re.compile(r'<(?:node|way|relation)[\s/>]')
+OSM_END = '</osm>'
+
+CHUNK_SIZE = 64 * 1024 * 1024
+SCAN_SIZE = 1024 * 1024
+
+
+# ================================================== #
+#               Helper Functions                     #
+# ================================================== #
+def next_element_start(osm_file, offset):
+    """Return the offset of the first top level element at or after offset"""
+    osm_file.seek(offset)
+    overlap = ''
+    while True:
+        block = osm_file.read(SCAN_SIZE)
+        if not block:
+            return None
+        data = overlap + block
+        m = TOP_LEVEL_START.search(data)
+        if m:
+            return offset - len(overlap) + m.start()
+        # Keep the tail in case a tag is split across two reads
+        overlap = data[-16:]
+        offset += len(block)
+
+
+def find_chunks(file_in, chunk_size=CHUNK_SIZE, min_chunks=1):
+    """Return (start, end) byte ranges covering every top level element"""
+    size = os.path.getsize(file_in)
+    n_chunks = max(min_chunks, size // chunk_size, 1)
+
+    with open(file_in, 'rb') as osm_file:
+        # Stop before the closing </osm> tag
+        osm_file.seek(max(0, size - SCAN_SIZE))
+        tail = osm_file.read()
+        end = size - len(tail) + tail.rfind(OSM_END) if OSM_END in tail else size
+
+        starts = []
+        for i in range(n_chunks):
+            start = next_element_start(osm_file, i * size // n_chunks)
+            if start is not None and start < end and start not in starts:
+                starts.append(start)
+
+    return zip(starts, starts[1:] + [end])
+
+
+def process_chunk(args):
+    """Shape one byte range of the OSM file into temporary .csv files
+
+    Returns the paths of the files, the policy's statistics (None without
+    validation) and the cleaning rule hits of this range.
+    """
+    file_in, start, end, policy, tmp_dir, index = args
+    # Pool workers run many ranges; count only this one's hits
+    VegasData.CLEANING_RULES.hits.clear()
+
+    with open(file_in, 'rb') as osm_file:
+        osm_file.seek(start)
+        data = StringIO('<osm>' + osm_file.read(end - start) + OSM_END)
+
+    paths = [os.path.join(tmp_dir, '%06d_%s' % (index, os.path.basename(path)))
+             for path, _ in OUTPUTS]
+    files = [codecs.open(path, 'w') for path in paths]
+    try:
+        nodes_writer, node_tags_writer, ways_writer, way_nodes_writer, \
+            way_tags_writer, relations_writer, relation_members_writer, \
+            relation_tags_writer = [UnicodeDictWriter(f, fields)
+                                    for f, (_, fields) in zip(files, OUTPUTS)]
+
+        for element in VegasData.get_element(data, tags=('node', 'way', 'relation')):
+            el = VegasData.shape_element(element)
+            if el:
+                members = el.pop('relation_members', ())
+                if policy is not None:
+                    policy.check(el)
+
+                if element.tag == 'node':
+                    nodes_writer.writerow(el['node'])
+                    node_tags_writer.writerows(el['node_tags'])
+                elif element.tag == 'way':
+                    ways_writer.writerow(el['way'])
+                    way_nodes_writer.writerows(el['way_nodes'])
+                    way_tags_writer.writerows(el['way_tags'])
+                elif element.tag == 'relation':
+                    relations_writer.writerow(el['relation'])
+                    relation_tags_writer.writerows(el['relation_tags'])
+                    for chunk in VegasData.chunks(members):
+                        if policy is not None:
+                            policy.check_part({'relation_members': chunk})
+                        relation_members_writer.writerows(chunk)
+        stats = policy.finish() if policy is not None else None
+    finally:
+        for f in files:
+            f.close()
+
+    return paths, stats, dict(VegasData.CLEANING_RULES.hits)
+
+
+# ================================================== #
+#               Main Function                        #
+# ================================================== #
+def process_map_parallel(file_in, validate, workers=None, chunk_size=CHUNK_SIZE):
+    """Process the XML file in chunks across a process pool and write to csv(s)
+
+    validate is as for VegasData.process_map, and so is the return value.
+    """
+    policy = VegasValidate.make_policy(validate)
+    if isinstance(policy, VegasValidate.ValidateInBackground):
+        raise ValueError('The process pool mode validates in the workers already')
+    workers = workers or multiprocessing.cpu_count()
+    chunks = find_chunks(file_in, chunk_size, min_chunks=workers)
+    tmp_dir = tempfile.mkdtemp(prefix='vegasdata_')
+
+    out_files = []
+    try:
+        for path, fields in OUTPUTS:
+            out_files.append(codecs.open(path, 'w'))
+            UnicodeDictWriter(out_files[-1], fields).writeheader()
+
+        tasks = [(file_in, start, end, policy, tmp_dir, i)
+                 for i, (start, end) in enumerate(chunks)]
+        seen = validated = 0
+
+        pool = multiprocessing.Pool(workers)
+        try:
+            # imap keeps chunk order, so rows come out in file order
+            for paths, stats, hits in pool.imap(process_chunk, tasks):
+                for f, path in zip(out_files, paths):
+                    with open(path, 'rb') as chunk_file:
+                        shutil.copyfileobj(chunk_file, f)
+                    os.remove(path)
+                if stats is not None:
+                    seen += stats['seen']
+                    validated += stats['validated']
+                for rule, count in hits.iteritems():
+                    VegasData.CLEANING_RULES.hits[rule] += count
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+    finally:
+        for f in out_files:
+            f.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    if policy is not None:
+        # The parent's copy never saw an element: give it the workers' counts
+        policy.seen = seen
+        policy.validated = validated
+        return policy.stats()
+
+
+if __name__ == '__main__':
+    process_map_parallel(VegasData.OSM_PATH, validate=False)
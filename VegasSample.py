@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+'''
+Referentially complete samples of an OSM file, for test fixtures. Unlike
+sample.py (every k-th element), no way or relation in the sample points at
+an element that was left out:
+- Pick ways and relations by a seeded hash of their id (the same fraction
+  of each type), or by a bounding box: the ways with a node inside it and
+  the relations with a picked way or a node inside it as a member
+- Pull in every node a picked way uses and every member of a picked
+  relation (member relations and their own members included). Those are
+  the only nodes in the sample: a node no picked way or relation uses is
+  left out, even inside the bounding box.
+- Copy the picked elements' bytes straight out of the memory-mapped input
+  (VegasStream.element_spans) instead of parsing and re-serializing them
+
+Pass 1 picks and marks the needed ids in IdSet bitmaps, pass 2 copies the
+marked elements in file order. A relation pulling in a way that wasn't
+picked needs that way's nodes, so then the ways are scanned once more in
+between. Relation member lists are kept in memory for pass 1; relations
+are a small fraction of any extract.
+'''
+
+import re
+import struct
+import sys
+import zlib
+
+from VegasStream import element_spans, open_mapped, root_span, span_id
+
+ND_REF = re.compile(br'<nd\s+ref="(-?\d+)"')
+MEMBER = re.compile(br'<member\s([^>]*)>')
+MEMBER_TYPE = re.compile(br'\btype="(\w+)"')
+MEMBER_REF = re.compile(br'\bref="(-?\d+)"')
+LAT_ATTR = re.compile(br'\slat="([^"]+)"')
+LON_ATTR = re.compile(br'\slon="([^"]+)"')
+
+ELEMENT_TYPES = ('node', 'way', 'relation')
+
+
+class IdSet(object):
+    """Bitmap of element ids, allocated in pages so sparse ids stay small
+
+    Each page covers 2**16 consecutive ids in 8 KB; the pages present are
+    kept in a dict, so ids spread over billions cost only the pages used.
+    """
+    PAGE_BITS = 16
+    PAGE_MASK = (1 << PAGE_BITS) - 1
+
+    def __init__(self):
+        self.pages = {}
+        self.count = 0
+
+    def add(self, element_id):
+        page = self.pages.get(element_id >> self.PAGE_BITS)
+        if page is None:
+            page = self.pages[element_id >> self.PAGE_BITS] = bytearray(1 << (self.PAGE_BITS - 3))
+        bit = element_id & self.PAGE_MASK
+        mask = 1 << (bit & 7)
+        if not page[bit >> 3] & mask:
+            page[bit >> 3] |= mask
+            self.count += 1
+
+    def __contains__(self, element_id):
+        page = self.pages.get(element_id >> self.PAGE_BITS)
+        if page is None:
+            return False
+        bit = element_id & self.PAGE_MASK
+        return bool(page[bit >> 3] & (1 << (bit & 7)))
+
+    def __len__(self):
+        return self.count
+
+
+# ================================================== #
+#               Helper Functions                     #
+# ================================================== #
+def hash_picker(fraction, seed=0):
+    """Return pick(id) -> True for about fraction of all ids
+
+    crc32 of the id packed as 8 bytes, started from the seed: the same ids
+    are picked on every run and Python version.
+    """
+    threshold = int(fraction * 0x100000000)
+
+    def pick(element_id):
+        return (zlib.crc32(struct.pack('<q', element_id), seed) & 0xffffffff) < threshold
+    return pick
+
+
+def node_location(data, start, end):
+    """(lat, lon) of the node at data[start:end], None if it has none"""
+    lat = LAT_ATTR.search(data, start, end)
+    lon = LON_ATTR.search(data, start, end)
+    if lat is None or lon is None:
+        return None
+    return float(lat.group(1)), float(lon.group(1))
+
+
+def way_refs(data, start, end):
+    return [int(ref) for ref in ND_REF.findall(data, start, end)]
+
+
+def relation_members(data, start, end):
+    """Return the (type, ref) of each member of the relation at data[start:end]"""
+    members = []
+    for attrs in MEMBER.findall(data, start, end):
+        member_type = MEMBER_TYPE.search(attrs)
+        member_ref = MEMBER_REF.search(attrs)
+        if member_type is not None and member_ref is not None:
+            members.append((member_type.group(1).decode('ascii'), int(member_ref.group(1))))
+    return members
+
+
+def line_start(data, start):
+    """Back up over the element's indentation, so it is copied as well"""
+    begin = data.rfind(b'\n', 0, start) + 1
+    if data[begin:start].strip():
+        return start
+    return begin
+
+
+# ================================================== #
+#               Main Functions                       #
+# ================================================== #
+def pick_elements(data, fraction=None, bbox=None, seed=0):
+    """Return {type: IdSet} of the elements making up the sample
+
+    Give either fraction (0-1, of the ways and of the relations) or bbox as
+    (min_lat, min_lon, max_lat, max_lon).
+    """
+    if (fraction is None) == (bbox is None):
+        raise ValueError('Sample either by fraction or by bbox')
+    pick = hash_picker(fraction, seed) if bbox is None else None
+
+    picked = dict((element_type, IdSet()) for element_type in ELEMENT_TYPES)
+    nodes, ways, relations = picked['node'], picked['way'], picked['relation']
+    inside = IdSet()
+    members = {}
+
+    # Pass 1: pick the ways and relations, and mark the nodes of the picked ways
+    for tag, start, end in element_spans(data, ELEMENT_TYPES):
+        element_id = span_id(data, start, end)
+        if tag == 'node':
+            # Nodes only come in through the ways and relations using them
+            if pick is None:
+                location = node_location(data, start, end)
+                if (location is not None and bbox[0] <= location[0] <= bbox[2] and
+                        bbox[1] <= location[1] <= bbox[3]):
+                    inside.add(element_id)
+        elif tag == 'way':
+            if pick is not None:
+                keep = pick(element_id)
+                refs = way_refs(data, start, end) if keep else ()
+            else:
+                refs = way_refs(data, start, end)
+                keep = any(ref in inside for ref in refs)
+            if keep:
+                ways.add(element_id)
+                for ref in refs:
+                    nodes.add(ref)
+        else:
+            members[element_id] = relation_members(data, start, end)
+            if pick is not None and pick(element_id):
+                relations.add(element_id)
+
+    if bbox is not None:
+        for relation_id, relation in members.items():
+            if any(ref in inside if member_type == 'node' else
+                   member_type == 'way' and ref in ways
+                   for member_type, ref in relation):
+                relations.add(relation_id)
+
+    # Pull in the members of the picked relations, following member relations
+    extra_ways = IdSet()
+    queue = [relation_id for relation_id in members if relation_id in relations]
+    while queue:
+        for member_type, ref in members.get(queue.pop(), ()):
+            if member_type == 'node':
+                nodes.add(ref)
+            elif member_type == 'way':
+                if ref not in ways:
+                    ways.add(ref)
+                    extra_ways.add(ref)
+            elif member_type == 'relation' and ref not in relations:
+                relations.add(ref)
+                queue.append(ref)
+
+    # The ways a relation pulled in need their nodes too
+    if len(extra_ways):
+        for _, start, end in element_spans(data, ('way',)):
+            if span_id(data, start, end) in extra_ways:
+                for ref in way_refs(data, start, end):
+                    nodes.add(ref)
+    return picked
+
+
+def write_sample(data, picked, file_out):
+    """Pass 2: copy the picked elements, in file order, to file_out
+
+    Returns the number of elements written per type. Elements other than
+    nodes, ways and relations (e.g. <bounds>) are dropped.
+    """
+    counts = dict((element_type, 0) for element_type in ELEMENT_TYPES)
+    with open(file_out, 'wb') as output:
+        output.write(data[:root_span(data)[1]])
+        output.write(b'\n')
+        for tag, start, end in element_spans(data, ELEMENT_TYPES):
+            if span_id(data, start, end) in picked[tag]:
+                output.write(data[line_start(data, start):end])
+                output.write(b'\n')
+                counts[tag] += 1
+        output.write(b'</osm>\n')
+    return counts
+
+
+def sample(file_in, file_out, fraction=None, bbox=None, seed=0):
+    """Write a referentially complete sample of file_in to file_out"""
+    data = open_mapped(file_in)
+    try:
+        picked = pick_elements(data, fraction, bbox, seed)
+        return write_sample(data, picked, file_out)
+    finally:
+        data.close()
+
+
+if __name__ == '__main__':
+    # Usage: python VegasSample.py in.osm out.osm 0.01 [seed]
+    #        python VegasSample.py in.osm out.osm min_lat,min_lon,max_lat,max_lon
+    if ',' in sys.argv[3]:
+        box = tuple(float(x) for x in sys.argv[3].split(','))
+        print(sample(sys.argv[1], sys.argv[2], bbox=box))
+    else:
+        print(sample(sys.argv[1], sys.argv[2], fraction=float(sys.argv[3]),
+                     seed=int(sys.argv[4]) if len(sys.argv) > 4 else 0))
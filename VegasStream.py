@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+# Shared streaming element iterator. ET.iterparse keeps every element it has
+# seen attached to the root, so a loop that never clears them ends up holding
+# the whole document in memory. Clearing the root after each top level element
+# keeps memory flat no matter how large the OSM file is.
+#
+# Three parser backends are available:
+# - 'etree': cElementTree iterparse, always available
+# - 'lxml':  lxml iterparse, filtering on tag names inside the parser
+# - 'expat': raw xml.parsers.expat callbacks building lightweight Record
+#            objects instead of full elements
+# The default is lxml when it is installed, otherwise cElementTree.
+#
+# element_spans() skips parsing altogether: it scans the raw bytes of a
+# memory-mapped file for where each top level element starts and ends, for
+# tools that copy or index elements rather than read them (VegasSample.py).
+
+import mmap
+import re
+try:
+    import xml.etree.cElementTree as ET
+except ImportError:
+    # Python 3.9+ dropped cElementTree; ElementTree is the C version there
+    import xml.etree.ElementTree as ET
+from xml.parsers import expat
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+try:
+    basestring
+except NameError:
+    basestring = str
+
+BACKENDS = ('etree', 'lxml', 'expat')
+DEFAULT_BACKEND = 'lxml' if lxml_etree is not None else 'etree'
+
+# Bytes handed to expat per call
+READ_SIZE = 64 * 1024
+
+TAG_NAME = re.compile(br'[^\s/>]+')
+ID_ATTR = re.compile(br'\sid="(-?\d+)"')
+
+
+class Record(object):
+    """Lightweight stand-in for an XML element built by the expat backend
+
+    Supports the parts of the element API the scripts use: .tag, .attrib,
+    .get(), len(), iterating over children and .iter().
+    """
+    __slots__ = ('tag', 'attrib', 'children')
+
+    def __init__(self, tag, attrib):
+        self.tag = tag
+        self.attrib = attrib
+        self.children = []
+
+    def get(self, key, default=None):
+        return self.attrib.get(key, default)
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def __len__(self):
+        return len(self.children)
+
+    def iter(self, tag=None):
+        if tag is None or self.tag == tag:
+            yield self
+        for child in self.children:
+            for elem in child.iter(tag):
+                yield elem
+
+    def clear(self):
+        self.attrib = {}
+        self.children = []
+
+
+class ElementStream(object):
+    """Iterate over the top level elements of an OSM file in bounded memory
+
+    Each element is yielded once it is complete (children included) and is
+    cleared as soon as the caller asks for the next one, so callers must not
+    keep references to yielded elements. The <osm> root is available as
+    .root once iteration has started, and is passed to on_root (if given)
+    before the first element is yielded.
+    """
+
+    def __init__(self, osm_file, tags=None, on_root=None, backend=None):
+        backend = backend or DEFAULT_BACKEND
+        if backend not in BACKENDS:
+            raise ValueError("Unknown parser backend '{0}'".format(backend))
+        if backend == 'lxml' and lxml_etree is None:
+            backend = 'etree'
+
+        self.osm_file = osm_file
+        self.tags = tags
+        self.on_root = on_root
+        self.backend = backend
+        self.root = None
+
+    def __iter__(self):
+        if self.backend == 'expat':
+            return self._iter_expat()
+        elif self.backend == 'lxml' and self.tags is not None:
+            return self._iter_lxml()
+        elif self.backend == 'lxml':
+            return self._iter_iterparse(lxml_etree.iterparse)
+        return self._iter_iterparse(ET.iterparse)
+
+    def _set_root(self, root):
+        self.root = root
+        if self.on_root is not None:
+            self.on_root(root)
+
+    def _iter_iterparse(self, iterparse):
+        context = iterparse(self.osm_file, events=('start', 'end'))
+        _, root = next(context)
+        self._set_root(root)
+
+        depth = 0
+        for event, elem in context:
+            if event == 'start':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    if self.tags is None or elem.tag in self.tags:
+                        yield elem
+                    root.clear()
+
+    def _iter_lxml(self):
+        # lxml only reports the requested tags, so nothing else reaches Python
+        context = lxml_etree.iterparse(self.osm_file, events=('end',),
+                                       tag=self.tags)
+        for _, elem in context:
+            parent = elem.getparent()
+            if self.root is None:
+                self._set_root(parent)
+            yield elem
+            # Drop this element and anything skipped before it (e.g. <bounds>)
+            elem.clear()
+            while elem.getprevious() is not None:
+                del parent[0]
+
+    def _iter_expat(self):
+        parser = expat.ParserCreate()
+        done = []
+        stack = []
+
+        def start(tag, attrib):
+            record = Record(tag, attrib)
+            if stack:
+                stack[-1].children.append(record)
+            else:
+                self._set_root(record)
+            stack.append(record)
+
+        def end(tag):
+            record = stack.pop()
+            if len(stack) == 1:
+                stack[0].children = []
+                if self.tags is None or record.tag in self.tags:
+                    done.append(record)
+
+        parser.StartElementHandler = start
+        parser.EndElementHandler = end
+
+        osm_file = self.osm_file
+        if isinstance(osm_file, basestring):
+            osm_file = open(osm_file, 'rb')
+        try:
+            while True:
+                data = osm_file.read(READ_SIZE)
+                parser.Parse(data, not data)
+                for record in done:
+                    yield record
+                del done[:]
+                if not data:
+                    break
+        finally:
+            if osm_file is not self.osm_file:
+                osm_file.close()
+
+
+def get_element(osm_file, tags=('node', 'way', 'relation'), backend=None):
+    """Yield element if it is the right type of tag"""
+    return iter(ElementStream(osm_file, tags, backend=backend))
+
+
+def get_change(osc_file):
+    """Yield (action, element) for each element of an OSM change (.osc) file
+
+    action is 'create', 'modify' or 'delete'. Elements are cleared once the
+    next one is asked for, same as ElementStream, so even a large <create>
+    block is read in bounded memory.
+    """
+    context = ET.iterparse(osc_file, events=('start', 'end'))
+    _, root = next(context)
+
+    depth = 0
+    action = None
+    for event, elem in context:
+        if event == 'start':
+            depth += 1
+            if depth == 1:
+                action = elem
+        else:
+            depth -= 1
+            if depth == 1:
+                yield action.tag, elem
+                action.clear()
+            elif depth == 0:
+                root.clear()
+
+
+# ================================================== #
+#               Raw Element Spans                    #
+# ================================================== #
+def open_mapped(path):
+    """Memory-map a file read-only; close the returned mmap when done"""
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _native(name):
+    """Tag names come out of the scanner as bytes; use str on Python 3 too"""
+    return name if str is bytes else name.decode('utf-8')
+
+
+def _find(data, sub, pos):
+    found = data.find(sub, pos)
+    if found < 0:
+        raise ValueError('Truncated OSM file: no {0!r} after byte {1}'.format(sub, pos))
+    return found
+
+
+def root_span(data):
+    """Return (start, end) of the <osm> root's start tag in the raw bytes"""
+    pos = 0
+    while True:
+        start = _find(data, b'<', pos)
+        mark = data[start + 1:start + 2]
+        if mark == b'?':
+            pos = _find(data, b'?>', start) + 2
+        elif mark == b'!':
+            pos = _find(data, b'>', start) + 1
+        else:
+            return start, _find(data, b'>', start) + 1
+
+
+def element_spans(data, tags=('node', 'way', 'relation')):
+    """Yield (tag, start, end) for each top level element of the raw bytes
+
+    data is the whole OSM document, usually a mmap from open_mapped();
+    data[start:end] is the element's source text, children included, so it
+    can be copied out unchanged. Nothing is parsed: one regex finds the
+    start tags of the requested top level names and the end is the closing
+    tag. This relies on the layout every OSM writer produces: those names
+    are never used for child elements (<tag>, <nd>, <member>), and '<' and
+    '>' in attribute values are escaped.
+    """
+    names = [tag.encode('ascii') for tag in tags]
+    start_tag = re.compile(br'<(' + b'|'.join(names) + br')(?=[\s/>])[^>]*>')
+    closes = dict((name, b'</' + name + b'>') for name in names)
+    native = dict((name, _native(name)) for name in names)
+    for match in start_tag.finditer(data, root_span(data)[1]):
+        gt = match.end()
+        name = match.group(1)
+        if data[gt - 2:gt - 1] == b'/':
+            end = gt
+        else:
+            end = _find(data, closes[name], gt) + len(closes[name])
+        yield native[name], match.start(), end
+
+
+def span_id(data, start, end):
+    """The id attribute of the element at data[start:end], as an int"""
+    return int(ID_ATTR.search(data, start, end).group(1))
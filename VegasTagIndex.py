@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+'''
+Inverted tag index, so a fix-up after the audit doesn't need another scan:
+- TagIndex.add() is called with each element of the audit pass and files
+  the element's id under key -> value -> element type for every tag
+  (VegasAudit's audits take index=..., VegasAnalysis runs TagIndexer when
+  asked to; it isn't in the default set since it grows with the file)
+- Each id list is delta-encoded as varints in a bytearray: ids come sorted
+  in an OSM file, so most deltas take one or two bytes
+- ids(key, value) lists the elements with a tag, values(key) the distinct
+  values of a key and how many elements have each
+- save() / load() keep the index in a sqlite file next to the OSM file
+- cleaning_targets() lists the elements each cleaning rule would change;
+  revalidate() fetches just those through the VegasIndex offset index,
+  shapes (and so cleans) and validates them
+'''
+
+import sqlite3
+import sys
+from collections import defaultdict
+
+import VegasAudit
+import VegasData
+import VegasIndex
+import VegasValidate
+
+TAG_INDEX_SUFFIX = '.tags'
+
+ELEMENT_TYPES = ('node', 'way', 'relation')
+
+# The tag keys cleaning_rules.json has rules for (addr:city, addr:state...)
+CLEANED_KEYS = frozenset(VegasData.CLEANING_RULES.keys())
+
+
+class Postings(object):
+    """Sorted-ish list of element ids, delta and varint encoded
+
+    Deltas are zigzag encoded, so ids that do come out of order still
+    round-trip; they just cost more bytes.
+    """
+    __slots__ = ('data', 'last', 'count')
+
+    def __init__(self, data=None, last=0, count=0):
+        self.data = bytearray() if data is None else bytearray(data)
+        self.last = last
+        self.count = count
+
+    def append(self, element_id):
+        delta = element_id - self.last
+        self.last = element_id
+        zigzag = delta * 2 if delta >= 0 else -delta * 2 - 1
+        data = self.data
+        while zigzag > 0x7f:
+            data.append((zigzag & 0x7f) | 0x80)
+            zigzag >>= 7
+        data.append(zigzag)
+        self.count += 1
+
+    def __iter__(self):
+        element_id = 0
+        zigzag = 0
+        shift = 0
+        for byte in self.data:
+            zigzag |= (byte & 0x7f) << shift
+            if byte & 0x80:
+                shift += 7
+                continue
+            element_id += zigzag >> 1 if not zigzag & 1 else -((zigzag + 1) >> 1)
+            yield element_id
+            zigzag = 0
+            shift = 0
+
+    def __len__(self):
+        return self.count
+
+
+class TagIndex(object):
+    """key -> value -> element type -> Postings of element ids
+
+    keys limits the index to those tag keys: by default the keys with
+    cleaning rules, keys=None indexes every key. Values are indexed as they
+    are in the OSM file, before any cleaning.
+    """
+
+    def __init__(self, keys=CLEANED_KEYS):
+        self.keys = frozenset(keys) if keys is not None else None
+        self.index = defaultdict(dict)
+
+    def add(self, element):
+        """Index the tags of one node, way or relation element"""
+        element_type = element.tag
+        if element_type not in ELEMENT_TYPES:
+            return
+        element_id = int(element.attrib['id'])
+        for tag in element.iter('tag'):
+            k = tag.attrib['k']
+            if self.keys is not None and k not in self.keys:
+                continue
+            by_type = self.index[k].get(tag.attrib['v'])
+            if by_type is None:
+                by_type = self.index[k][tag.attrib['v']] = {}
+            postings = by_type.get(element_type)
+            if postings is None:
+                postings = by_type[element_type] = Postings()
+            postings.append(element_id)
+
+    # -------------------- queries -------------------- #
+
+    def ids(self, key, value, element_type=None):
+        """Return the ids of the elements with tag key=value
+
+        With element_type, a list of ids of that type; otherwise a list of
+        (type, id) for nodes, then ways, then relations.
+        """
+        by_type = self.index.get(key, {}).get(value, {})
+        if element_type is not None:
+            return list(by_type.get(element_type, ()))
+        return [(t, element_id) for t in ELEMENT_TYPES
+                for element_id in by_type.get(t, ())]
+
+    def count(self, key, value):
+        by_type = self.index.get(key, {}).get(value, {})
+        return sum(len(postings) for postings in by_type.values())
+
+    def values(self, key):
+        """Return {value: number of elements} for a tag key"""
+        return dict((value, sum(len(postings) for postings in by_type.values()))
+                    for value, by_type in self.index.get(key, {}).items())
+
+    def size(self):
+        """Bytes used by the encoded id lists"""
+        return sum(len(postings.data) for by_value in self.index.values()
+                   for by_type in by_value.values() for postings in by_type.values())
+
+    # -------------------- storage -------------------- #
+
+    def save(self, path):
+        conn = sqlite3.connect(path)
+        conn.execute('DROP TABLE IF EXISTS postings')
+        conn.execute('''CREATE TABLE postings (
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            type TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            last INTEGER NOT NULL,
+            ids BLOB NOT NULL,
+            PRIMARY KEY (key, value, type)
+        ) WITHOUT ROWID''')
+        conn.executemany('INSERT INTO postings VALUES (?, ?, ?, ?, ?, ?)',
+                         ((k, v, t, postings.count, postings.last, sqlite3.Binary(bytes(postings.data)))
+                          for k, by_value in self.index.items()
+                          for v, by_type in by_value.items()
+                          for t, postings in by_type.items()))
+        conn.commit()
+        conn.close()
+
+    @classmethod
+    def load(cls, path):
+        tag_index = cls(keys=None)
+        conn = sqlite3.connect(path)
+        for k, v, t, count, last, ids in conn.execute('SELECT * FROM postings'):
+            tag_index.index[k].setdefault(v, {})[t] = Postings(ids, last, count)
+        conn.close()
+        return tag_index
+
+
+# ================================================== #
+#               Targeted Cleaning                    #
+# ================================================== #
+def cleaning_targets(tag_index, rules=VegasData.CLEANING_RULES):
+    """Return (key, old value, new value, [(type, id), ...]) for every
+    cleaning rule that matches at least one element, most elements first"""
+    targets = []
+    for (k, old), new in rules.rules.items():
+        found = tag_index.ids(k, old)
+        if found:
+            targets.append((k, old, new, found))
+    return sorted(targets, key=lambda target: (-len(target[3]), target[0], target[1]))
+
+
+def revalidate(osm_path, keys, validator=None):
+    """Yield (type, id, shaped element) for each (type, id) in keys
+
+    The elements are fetched through the VegasIndex offset index (built if
+    needed), shaped with VegasData.shape_element(), which applies the
+    cleaning rules, and validated; an invalid element raises like it does
+    in VegasData.process_map.
+    """
+    validator = validator or VegasValidate.FastValidator()
+    offsets = VegasIndex.open_index(osm_path)
+    try:
+        for element_type, element_id, element in offsets.fetch_many(keys):
+            shaped = VegasData.shape_element(element)
+            if 'relation_members' in shaped:
+                shaped['relation_members'] = list(shaped['relation_members'])
+            VegasData.validate_element(shaped, validator)
+            yield element_type, element_id, shaped
+    finally:
+        offsets.close()
+
+
+if __name__ == '__main__':
+    # Usage: python VegasTagIndex.py [osm file]
+    # Audit the states, keeping the tag index, then re-check every element
+    # a cleaning rule touches without reading the whole file again
+    osm_path = sys.argv[1] if len(sys.argv) > 1 else VegasData.OSM_PATH
+    tag_index = TagIndex()
+    print VegasAudit.state_name_audit(osm_path, index=tag_index)
+    tag_index.save(osm_path + TAG_INDEX_SUFFIX)
+
+    for k, old, new, found in cleaning_targets(tag_index):
+        checked = sum(1 for _ in revalidate(osm_path, found))
+        print '%s=%s -> %s: %d elements, %d valid after cleaning' % (k, old, new, len(found), checked)
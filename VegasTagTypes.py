@@ -5,13 +5,9 @@
 Data Wrangling Project
 By: Kyle Campbell
 """
-import xml.etree.cElementTree as ET
 import pprint
-import re
-
-lower = re.compile(r'^([a-z]|_)*$')
-lower_colon = re.compile(r'^([a-z]|_)*:([a-z]|_)*$')
-problemchars = re.compile(r'[=\+/&<>;\'"\?%#$@\,\. \t\r\n]')
+from VegasKeys import classify_key
+from VegasStream import get_element
 
 OSM = 'las-vegas_nevada.osm'
 
@@ -19,23 +15,21 @@ OSM = 'las-vegas_nevada.osm'
 def key_type(element, keys):
     if element.tag == 'tag':
         for tag in element.iter('tag'):
-            if lower.search(tag.attrib['k']):
-                keys['lower'] += 1
-            elif lower_colon.search(tag.attrib['k']):
-                keys['lower_colon'] += 1
-            elif problemchars.search(tag.attrib['k']):
-                keys['problemchars'] += 1
-            else:
-                keys['other'] += 1
-                print tag.attrib['k']
+            key_class = classify_key(tag.attrib['k'])[2]
+            keys[key_class] += 1
+            if key_class == 'other':
+                print tag.attrib['k'].encode('utf-8')
     return keys
 
 
 def process_map(filename):
     keys = {"lower": 0, "lower_colon": 0, "problemchars": 0, "other": 0}
-    for _, element in ET.iterparse(filename):
-        keys = key_type(element, keys)
+    for top in get_element(filename, tags=None):
+        for element in top.iter('tag'):
+            keys = key_type(element, keys)
 
     return keys
 
-pprint.pprint(process_map(OSM))
+if __name__ == '__main__':
+    pprint.pprint(process_map(OSM))
+
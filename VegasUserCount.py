@@ -6,7 +6,7 @@ Data Wrangling Project
 By: Kyle Campbell
 """
 
-import xml.etree.cElementTree as ET
+from VegasStream import get_element
 
 OSM = 'las-vegas_nevada.osm'
 
@@ -20,12 +20,14 @@ def get_user(element):
 # Creating a set of UIDs
 def process_map(filename):
     users = set()
-    for _, element in ET.iterparse(filename):
+    for element in get_element(filename, tags=None):
         if 'uid' in element.attrib:
             users.add(element.get('uid'))
     return users
     
 # Printing number of Unique UIDs
-x = process_map(OSM)
-print '# of Unique UIDs:'
-print len(x)
+if __name__ == '__main__':
+    x = process_map(OSM)
+    print '# of Unique UIDs:'
+    print len(x)
+
@@ -0,0 +1,399 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+# Compiled replacement for cerberus validation of shaped elements.
+#
+# cerberus walks the schema rules for every document it validates, which is
+# what makes validation ~10X slower than shaping alone. compile_schema() reads
+# schema.schema once and builds one checking function per element type (node,
+# node_tags, way, way_nodes, way_tags, relation, relation_members,
+# relation_tags) that only does the required-field, type and coercion tests.
+# Only when a document fails the compiled check is it run through cerberus,
+# so the errors reported are exactly cerberus' errors.
+
+import Queue
+import random
+import threading
+
+import cerberus
+import schema
+
+SCHEMA = schema.schema
+
+# cerberus type names -> Python types, as cerberus defines them
+TYPES = {
+    'integer': (int, long),
+    'float': (float, int, long),
+    'string': basestring,
+    'dict': dict,
+    'list': list,
+}
+
+
+def compile_field(rules):
+    """Return a function that checks one value against its cerberus rules"""
+    if rules['type'] == 'dict':
+        return compile_dict(rules['schema'])
+    if rules['type'] == 'list':
+        return compile_list(rules['schema'])
+
+    types = TYPES[rules['type']]
+    coerce = rules.get('coerce')
+    if coerce is None:
+        return lambda value: isinstance(value, types)
+
+    def check(value):
+        try:
+            value = coerce(value)
+        except (TypeError, ValueError):
+            return False
+        return isinstance(value, types)
+    return check
+
+
+def compile_dict(fields):
+    """Return a function that checks a dict against a cerberus field schema
+
+    The checks are written out as straight-line source, one block per field,
+    so validating a document runs no loops over the schema.
+    """
+    namespace = {'known': frozenset(fields)}
+    lines = ['def check(doc):',
+             '    if not isinstance(doc, dict) or not known.issuperset(doc):',
+             '        return False',
+             '    try:']
+
+    for i, (name, rules) in enumerate(sorted(fields.iteritems())):
+        indent = '        '
+        if not rules.get('required', False):
+            lines.append('        if %r in doc:' % name)
+            indent += '    '
+        lines.append('%svalue = doc[%r]' % (indent, name))
+        # cerberus rejects None unless the rule is nullable
+        lines.append('%sif value is None:' % indent)
+        lines.append('%s    return False' % indent)
+
+        if rules['type'] in ('dict', 'list'):
+            namespace['check_%d' % i] = compile_field(rules)
+            lines.append('%sif not check_%d(value):' % (indent, i))
+        else:
+            namespace['types_%d' % i] = TYPES[rules['type']]
+            if rules.get('coerce') is not None:
+                namespace['coerce_%d' % i] = rules['coerce']
+                lines.append('%svalue = coerce_%d(value)' % (indent, i))
+            lines.append('%sif not isinstance(value, types_%d):' % (indent, i))
+        lines.append('%s    return False' % indent)
+
+    lines += ['    except (KeyError, TypeError, ValueError):',
+              '        return False',
+              '    return True']
+
+    exec '\n'.join(lines) in namespace
+    return namespace['check']
+
+
+def compile_list(item_rules):
+    """Return a function that checks every item of a list"""
+    check_item = compile_field(item_rules)
+
+    def check(doc):
+        if not isinstance(doc, list):
+            return False
+        for item in doc:
+            if item is None or not check_item(item):
+                return False
+        return True
+    return check
+
+
+def compile_schema(schema=SCHEMA):
+    """Return {element type: check function} for a cerberus schema"""
+    return dict((name, compile_field(rules)) for name, rules in schema.iteritems())
+
+
+class FastValidator(object):
+    """Drop-in for cerberus.Validator in VegasData.validate_element
+
+    validate() runs the compiled checks and only hands the document to
+    cerberus when they fail, so .errors is always cerberus' own report.
+    """
+
+    def __init__(self):
+        self.errors = {}
+        self._compiled = {}
+        self._cerberus = None
+
+    def validate(self, document, schema=SCHEMA):
+        # Keyed on id(), so keep the schema itself alive next to its checks
+        compiled = self._compiled.get(id(schema))
+        if compiled is None:
+            compiled = self._compiled[id(schema)] = (schema, compile_schema(schema))
+        checks = compiled[1]
+
+        passed = True
+        for name, value in document.iteritems():
+            check = checks.get(name)
+            if check is None or value is None or not check(value):
+                passed = False
+                break
+        if passed:
+            self.errors = {}
+            return True
+
+        if self._cerberus is None:
+            self._cerberus = cerberus.Validator()
+        result = self._cerberus.validate(document, schema)
+        self.errors = self._cerberus.errors
+        return result
+
+
+# ================================================== #
+#               Validation Policies                  #
+# ================================================== #
+
+class ValidationPolicy(object):
+    """Decides which shaped elements process_map validates
+
+    check() is called with every shaped element, finish() once the file has
+    been written; finish() raises on any outstanding validation error and
+    returns the coverage statistics. Parts of an element shaped apart (the
+    chunks of a relation's members) go to check_part() after check().
+    """
+    name = None
+
+    def __init__(self):
+        # Imported here since VegasData imports this module
+        from VegasData import validate_element
+        self.validate_element = validate_element
+        self.validator = FastValidator()
+        self.seen = 0
+        self.validated = 0
+        # Whether check() picked the last element, for check_part()
+        self.picked = False
+
+    def __getstate__(self):
+        # Sent to VegasParallel's workers; the compiled checks don't pickle
+        state = self.__dict__.copy()
+        del state['validate_element'], state['validator']
+        return state
+
+    def __setstate__(self, state):
+        from VegasData import validate_element
+        self.__dict__.update(state)
+        self.validate_element = validate_element
+        self.validator = FastValidator()
+
+    def check(self, el):
+        raise NotImplementedError
+
+    def check_part(self, part):
+        """Validate a part of the element last passed to check() if that
+        element was picked; parts don't count as elements in the stats"""
+        if self.picked:
+            self.validate_part(part)
+
+    def validate(self, el):
+        self.validated += 1
+        self.validate_element(el, self.validator)
+
+    def validate_part(self, part):
+        self.validate_element(part, self.validator)
+
+    def finish(self):
+        return self.stats()
+
+    def stats(self):
+        """Coverage, plus a 95% upper bound on the share of invalid elements
+
+        Any failure raises, so the bound assumes every validated element
+        passed: the largest error rate p with (1 - p) ** validated >= 0.05.
+        """
+        return {
+            'policy': self.name,
+            'seen': self.seen,
+            'validated': self.validated,
+            'coverage': float(self.validated) / self.seen if self.seen else 0.0,
+            'max_error_rate_95': (1 - 0.05 ** (1.0 / self.validated)
+                                  if self.validated else 1.0),
+        }
+
+
+class ValidateAll(ValidationPolicy):
+    """Validate every element (validate=True)"""
+    name = 'all'
+
+    def check(self, el):
+        self.seen += 1
+        self.picked = True
+        self.validate(el)
+
+
+class ValidateEveryNth(ValidationPolicy):
+    """Validate the 1st, (n+1)th, (2n+1)th, ... element"""
+    name = 'every_nth'
+
+    def __init__(self, n):
+        super(ValidateEveryNth, self).__init__()
+        self.n = n
+
+    def check(self, el):
+        self.picked = self.seen % self.n == 0
+        if self.picked:
+            self.validate(el)
+        self.seen += 1
+
+
+class ValidateSample(ValidationPolicy):
+    """Validate a uniform random sample of k elements once the file is read
+
+    Keeps a reservoir of k shaped elements, so memory stays bounded. The
+    parts of an element are validated straight away if it enters the
+    reservoir, even if it is replaced later on.
+    """
+    name = 'sample'
+
+    def __init__(self, k, seed=None):
+        super(ValidateSample, self).__init__()
+        self.k = k
+        self.random = random.Random(seed)
+        self.reservoir = []
+
+    def check(self, el):
+        self.seen += 1
+        self.picked = True
+        if len(self.reservoir) < self.k:
+            self.reservoir.append(el)
+        else:
+            i = self.random.randrange(self.seen)
+            if i < self.k:
+                self.reservoir[i] = el
+            else:
+                self.picked = False
+
+    def finish(self):
+        for el in self.reservoir:
+            self.validate(el)
+        self.reservoir = []
+        return self.stats()
+
+
+class ValidateCleaned(ValidationPolicy):
+    """Validate only elements a cleaning rule rewrote a value of
+
+    Watches VegasData.CLEANING_RULES' running count of rewritten values, so
+    check() must follow the shaping of each element, as it does in
+    process_map. Note the error bound in stats() only speaks for those
+    elements.
+    """
+    name = 'cleaned'
+
+    def __init__(self):
+        super(ValidateCleaned, self).__init__()
+        self._watch_rules()
+
+    def _watch_rules(self):
+        from VegasData import CLEANING_RULES
+        self.rules = CLEANING_RULES
+        self.last_cleaned = CLEANING_RULES.cleaned
+
+    def __getstate__(self):
+        # A worker process watches its own copy of the rules
+        state = super(ValidateCleaned, self).__getstate__()
+        del state['rules'], state['last_cleaned']
+        return state
+
+    def __setstate__(self, state):
+        super(ValidateCleaned, self).__setstate__(state)
+        self._watch_rules()
+
+    def check(self, el):
+        self.seen += 1
+        cleaned = self.rules.cleaned
+        self.picked = cleaned != self.last_cleaned
+        self.last_cleaned = cleaned
+        if self.picked:
+            self.validate(el)
+
+
+class ValidateInBackground(ValidationPolicy):
+    """Validate every element in batches on a worker thread
+
+    Shaping and writing carry on while the batches are checked. The queue
+    is bounded, so a slow validator holds up the main thread rather than
+    piling up elements. A failure is raised from the next check() or from
+    finish().
+    """
+    name = 'background'
+
+    def __init__(self, batch_size=1000, max_batches=8):
+        super(ValidateInBackground, self).__init__()
+        self.batch_size = batch_size
+        self.batch = []
+        self.queue = Queue.Queue(max_batches)
+        self.error = None
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                return
+            if self.error is None:
+                try:
+                    for el, part in batch:
+                        if part:
+                            self.validate_part(el)
+                        else:
+                            self.validate(el)
+                except Exception as e:
+                    self.error = e
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def _add(self, el, part):
+        self._raise_error()
+        self.batch.append((el, part))
+        if len(self.batch) >= self.batch_size:
+            self.queue.put(self.batch)
+            self.batch = []
+
+    def check(self, el):
+        self.seen += 1
+        self.picked = True
+        self._add(el, False)
+
+    def check_part(self, part):
+        self._add(part, True)
+
+    def finish(self):
+        if self.batch:
+            self.queue.put(self.batch)
+            self.batch = []
+        self.queue.put(None)
+        self.thread.join()
+        self._raise_error()
+        return self.stats()
+
+
+def make_policy(validate):
+    """Return the ValidationPolicy for process_map's validate argument
+
+    validate may be True (every element), False/None (no validation) or a
+    ValidationPolicy instance.
+    """
+    if validate is True:
+        return ValidateAll()
+    if validate is False or validate is None:
+        return None
+    if isinstance(validate, ValidationPolicy):
+        return validate
+    raise ValueError('validate must be True, False or a ValidationPolicy')
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+# Elements/second for each VegasStream parser backend on the same file.
+# Every backend has to touch each element's children the way shape_element
+# does, and must report the same element and tag counts as cElementTree.
+#
+# Usage: python bench_backends.py [osm file]
+# Without a file a synthetic one is generated.
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import osm_fixture
+import VegasStream
+
+N_NODES = 200000
+REPEAT = 3
+
+
+def run(path, backend):
+    elements = tags = 0
+    for element in VegasStream.get_element(path, tags=('node', 'way'),
+                                           backend=backend):
+        elements += 1
+        for secondary in element:
+            if secondary.tag == 'tag':
+                tags += 1
+                secondary.attrib['k']
+    return elements, tags
+
+
+def main():
+    tmp_dir = None
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    else:
+        tmp_dir = tempfile.mkdtemp(prefix='bench_backends_')
+        path = osm_fixture.write_osm(os.path.join(tmp_dir, 'bench.osm'), N_NODES)
+
+    try:
+        print '%s (%.1f MB)' % (path, os.path.getsize(path) / 1048576.0)
+        expected = None
+        for backend in VegasStream.BACKENDS:
+            if backend == 'lxml' and VegasStream.lxml_etree is None:
+                print '%-6s not installed' % backend
+                continue
+            best = None
+            for _ in range(REPEAT):
+                start = time.time()
+                counts = run(path, backend)
+                elapsed = time.time() - start
+                best = elapsed if best is None else min(best, elapsed)
+            if expected is None:
+                expected = counts
+            assert counts == expected, '%s counted %r, expected %r' % (
+                backend, counts, expected)
+            print '%-6s %8.2f s  %10.0f elements/s' % (backend, best,
+                                                      counts[0] / best)
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+# Plain vs dictionary-encoded output: .csv and database size, load time and
+# the SQLquery.py queries, run on the plain tables, on the views of the
+# encoded database and as SQLencode.QUERIES on its codes. All three must
+# return the same rows for every query.
+#
+# Usage: python bench_encoded.py [osm file]
+# Without a file a synthetic one is generated.
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import osm_fixture
+import SQLencode
+import SQLload
+import VegasData
+from bench_queries import QUERIES, time_queries
+
+N_NODES = 200000
+
+QUERIES = QUERIES + [
+    ('top_users', '''SELECT user, COUNT(user) as NUM
+                     FROM (SELECT user FROM nodes UNION ALL
+                           SELECT user FROM ways)
+                     GROUP BY user
+                     ORDER BY NUM DESC
+                     LIMIT 10'''),
+]
+
+
+def csv_size(paths):
+    return sum(os.path.getsize(path) for path in paths)
+
+
+def write_csvs(path, encoded):
+    """Return seconds taken and bytes written by VegasData.process_map"""
+    start = time.time()
+    VegasData.process_map(path, validate=False, fast=True, encoded=encoded)
+    elapsed = time.time() - start
+    if encoded:
+        paths = [VegasData.ENCODED_NODES_PATH, VegasData.ENCODED_NODE_TAGS_PATH,
+                 VegasData.ENCODED_WAYS_PATH, VegasData.ENCODED_WAY_TAGS_PATH,
+                 VegasData.WAY_NODES_PATH] + VegasData.LOOKUP_PATHS.values()
+    else:
+        paths = [VegasData.NODES_PATH, VegasData.NODE_TAGS_PATH, VegasData.WAYS_PATH,
+                 VegasData.WAY_TAGS_PATH, VegasData.WAY_NODES_PATH]
+    return elapsed, csv_size(paths)
+
+
+def main():
+    cwd = os.getcwd()
+    tmp_dir = tempfile.mkdtemp(prefix='bench_encoded_')
+    try:
+        if len(sys.argv) > 1:
+            path = os.path.abspath(sys.argv[1])
+        else:
+            path = osm_fixture.write_osm(os.path.join(tmp_dir, 'bench.osm'), N_NODES)
+        os.chdir(tmp_dir)
+
+        plain_db = os.path.join(tmp_dir, 'plain.db')
+        encoded_db = os.path.join(tmp_dir, 'encoded.db')
+        sizes = {}
+        times = {}
+
+        times['plain csv'], sizes['plain csv'] = write_csvs(path, False)
+        times['encoded csv'], sizes['encoded csv'] = write_csvs(path, True)
+
+        start = time.time()
+        SQLload.load_map(path, plain_db)
+        times['plain db'] = time.time() - start
+        start = time.time()
+        SQLencode.load_map_encoded(path, encoded_db)
+        times['encoded db'] = time.time() - start
+        sizes['plain db'] = os.path.getsize(plain_db)
+        sizes['encoded db'] = os.path.getsize(encoded_db)
+
+        print '%-12s %10s %10s' % ('output', 'MB', 'write s')
+        for name in ['plain csv', 'encoded csv', 'plain db', 'encoded db']:
+            print '%-12s %10.1f %10.2f' % (name, sizes[name] / 1048576.0, times[name])
+
+        names = [name for name, _ in SQLencode.QUERIES]
+        queries = [query for query in QUERIES if query[0] in names]
+        conn = sqlite3.connect(plain_db)
+        plain = time_queries(conn, queries)
+        conn.close()
+        conn = sqlite3.connect(encoded_db)
+        views = time_queries(conn, queries)
+        coded = time_queries(conn, SQLencode.QUERIES)
+        conn.close()
+
+        print '%-12s %10s %10s %10s %8s' % ('query', 'plain ms', 'views ms',
+                                            'codes ms', 'speedup')
+        for name in names:
+            assert plain[name][1] == views[name][1] == coded[name][1], name
+            print '%-12s %10.2f %10.2f %10.2f %7.1fx' % (
+                name, plain[name][0] * 1000, views[name][0] * 1000,
+                coded[name][0] * 1000, plain[name][0] / max(coded[name][0], 1e-6))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
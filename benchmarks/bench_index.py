@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+# Cost of looking at a handful of elements: a streaming pass over the whole
+# file (what every script did) against VegasIndex.py fetches through the
+# offset index, plus the one-off time to build the index. Both ways must
+# return the same elements.
+#
+# Usage: python bench_index.py [osm file]
+# Without a file a synthetic one is generated.
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import osm_fixture
+import VegasIndex
+import VegasStream
+
+N_NODES = 1000000
+FETCHES = [1, 10, 100, 1000]
+
+
+def scan(path, wanted):
+    """Stream the whole file and keep the wanted (type, id) elements"""
+    found = {}
+    for element in VegasStream.get_element(path, backend='etree'):
+        key = (element.tag, int(element.attrib['id']))
+        if key in wanted:
+            found[key] = (dict(element.attrib), len(element))
+    return found
+
+
+def main():
+    tmp_dir = tempfile.mkdtemp(prefix='bench_index_')
+    try:
+        if len(sys.argv) > 1:
+            path = sys.argv[1]
+        else:
+            path = osm_fixture.write_osm(os.path.join(tmp_dir, 'bench.osm'), N_NODES)
+        index_path = os.path.join(tmp_dir, 'bench.osm.idx')
+
+        start = time.time()
+        count = VegasIndex.build_index(path, index_path)
+        print 'index build %.2f s for %d elements (%.1f MB sidecar)' % (
+            time.time() - start, count, os.path.getsize(index_path) / 1e6)
+
+        index = VegasIndex.OffsetIndex(path, index_path)
+        keys = [tuple(row) for row in index.conn.execute('SELECT type, id FROM offsets')]
+        rand = random.Random(0)
+
+        print '%8s %10s %12s %10s' % ('elements', 'scan s', 'index ms', 'speedup')
+        for n in FETCHES:
+            wanted = set(rand.sample(keys, n))
+            start = time.time()
+            expected = scan(path, wanted)
+            scan_time = time.time() - start
+
+            start = time.time()
+            found = dict(((element_type, element_id), (dict(element.attrib), len(element)))
+                         for element_type, element_id, element in index.fetch_many(wanted))
+            index_time = time.time() - start
+            assert found == expected, n
+            print '%8d %10.2f %12.2f %9.0fx' % (n, scan_time, index_time * 1000,
+                                                scan_time / max(index_time, 1e-6))
+        index.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+# Per-tag cost of classifying tag keys: the regexes shape_element and
+# VegasTagTypes.key_type used to run on every tag, against the cached
+# VegasKeys classification. Both must give the same answer for every key.
+#
+# Usage: python bench_keys.py [osm file]
+# Without a file a synthetic one is generated.
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import osm_fixture
+import VegasKeys
+import VegasStream
+from VegasKeys import LOWER, LOWER_COLON, LOWER_COLON_ONLY, PROBLEMCHARS
+
+N_NODES = 200000
+REPEAT = 3
+
+
+def regex_classify(k):
+    """The per-tag tests as they were written in shape_element and key_type"""
+    if PROBLEMCHARS.match(k):
+        tag_type, key = None, None
+    elif LOWER_COLON.match(k):
+        key = k.split(':', 1)[1]
+        tag_type = k.split(':')[0]
+    else:
+        tag_type, key = 'regular', k
+
+    if LOWER.search(k):
+        key_class = 'lower'
+    elif LOWER_COLON_ONLY.search(k):
+        key_class = 'lower_colon'
+    elif PROBLEMCHARS.search(k):
+        key_class = 'problemchars'
+    else:
+        key_class = 'other'
+    return tag_type, key, key_class
+
+
+def tag_keys(path):
+    return [secondary.attrib['k']
+            for element in VegasStream.get_element(path, tags=('node', 'way'))
+            for secondary in element if secondary.tag == 'tag']
+
+
+def best_time(classify, keys):
+    best = None
+    for _ in range(REPEAT):
+        start = time.time()
+        for k in keys:
+            classify(k)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    tmp_dir = None
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    else:
+        tmp_dir = tempfile.mkdtemp(prefix='bench_keys_')
+        path = osm_fixture.write_osm(os.path.join(tmp_dir, 'bench.osm'), N_NODES)
+
+    try:
+        keys = tag_keys(path)
+        classifier = VegasKeys.KeyClassifier()
+        for k in set(keys):
+            assert regex_classify(k) == classifier(k), k
+        print '%d tags, %d distinct keys' % (len(keys), len(classifier.cache))
+
+        regex = best_time(regex_classify, keys)
+        cached = best_time(classifier, keys)
+        print '%-8s %8.0f ns/tag' % ('regex', regex / len(keys) * 1e9)
+        print '%-8s %8.0f ns/tag' % ('cached', cached / len(keys) * 1e9)
+        print 'speedup  %8.1fx' % (regex / max(cached, 1e-9))
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+# Peak memory regression benchmark for VegasStream.ElementStream.
+# Each input size is streamed in a fresh process (peak RSS only ever goes
+# up within a process) and the run fails if the peak crosses MAX_RSS_MB or
+# grows noticeably as the input gets bigger.
+
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import osm_fixture
+
+# Node counts; each step is a 4x larger file
+SIZES = [10000, 40000, 160000]
+
+# Fixed ceiling for the whole process, interpreter included
+MAX_RSS_MB = 32
+
+# Allowed difference between the smallest and largest input
+MAX_GROWTH_MB = 8
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def stream_file(path):
+    """Run every streaming consumer over path and return peak RSS in MB"""
+    import VegasAnalysis
+    VegasAnalysis.run_analyses(path)
+    return peak_rss_mb()
+
+
+def measure(path):
+    # The child's output is a pipe, so tell it how to encode what it prints
+    out = subprocess.check_output([sys.executable, os.path.abspath(__file__),
+                                   '--child', path],
+                                  env=dict(os.environ, PYTHONIOENCODING='utf-8'))
+    # Only the last line is ours; the tag type counter prints odd keys
+    return float(out.strip().splitlines()[-1])
+
+
+def main():
+    tmp_dir = tempfile.mkdtemp(prefix='bench_memory_')
+    try:
+        peaks = []
+        for n_nodes in SIZES:
+            path = osm_fixture.write_osm(os.path.join(tmp_dir, '%d.osm' % n_nodes),
+                                         n_nodes)
+            peak = measure(path)
+            peaks.append(peak)
+            print '%8d nodes %8.1f MB file  peak RSS %6.1f MB' % (
+                n_nodes, os.path.getsize(path) / 1048576.0, peak)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    assert max(peaks) < MAX_RSS_MB, \
+        'peak RSS %.1f MB over the %d MB ceiling' % (max(peaks), MAX_RSS_MB)
+    assert peaks[-1] - peaks[0] < MAX_GROWTH_MB, \
+        'peak RSS grew %.1f MB with input size' % (peaks[-1] - peaks[0])
+    print 'OK'
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == '--child':
+        print stream_file(sys.argv[2])
+    else:
+        main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+# Wall time of VegasData.process_map against the staged VegasPipeline.py
+# version, validating and on the fast path, with the pipeline's stage and
+# queue report for each. Both must write the same .csv files.
+#
+# Usage: python bench_pipeline.py [osm file]
+# Without a file a synthetic one is generated.
+
+import filecmp
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import osm_fixture
+import VegasData
+import VegasPipeline
+
+N_NODES = 200000
+
+# (label, validate, fast)
+RUNS = [('validate', True, False),
+        ('fast', False, True)]
+
+
+def run_in(directory, run):
+    """Run in directory, where the .csv files are written; return seconds"""
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        start = time.time()
+        result = run()
+        return time.time() - start, result
+    finally:
+        os.chdir(cwd)
+
+
+def main():
+    tmp_dir = tempfile.mkdtemp(prefix='bench_pipeline_')
+    try:
+        if len(sys.argv) > 1:
+            path = os.path.abspath(sys.argv[1])
+        else:
+            path = osm_fixture.write_osm(os.path.join(tmp_dir, 'bench.osm'), N_NODES)
+        serial_dir = os.path.join(tmp_dir, 'serial')
+        pipeline_dir = os.path.join(tmp_dir, 'pipeline')
+        os.mkdir(serial_dir)
+        os.mkdir(pipeline_dir)
+
+        for label, validate, fast in RUNS:
+            serial, _ = run_in(serial_dir,
+                               lambda: VegasData.process_map(path, validate, fast=fast))
+            staged, report = run_in(pipeline_dir,
+                                    lambda: VegasPipeline.process_map_pipeline(path, validate, fast))
+            for _, csv_path, _ in VegasPipeline.TABLES:
+                assert filecmp.cmp(os.path.join(serial_dir, csv_path),
+                                   os.path.join(pipeline_dir, csv_path), shallow=False), csv_path
+            print '%s: process_map %.2f s, pipeline %.2f s' % (label, serial, staged)
+            VegasPipeline.print_report(report)
+            print
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+# Latency of the SQLquery.py queries before and after SQLload.create_indexes.
+#
+# Usage: python bench_queries.py [osm file]
+# Without a file a synthetic one is generated.
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import osm_fixture
+import SQLload
+
+N_NODES = 200000
+REPEAT = 5
+
+# Same SQL as the query functions in SQLquery.py
+QUERIES = [
+    ('cafe_count', '''SELECT COUNT(*) FROM nodes_tags
+                      WHERE nodes_tags.value = 'cafe' OR
+                      nodes_tags.value = 'coffee_shop' '''),
+    ('religion', '''SELECT nodes_tags.value, COUNT(*) as NUM
+                    FROM nodes_tags JOIN
+                    (SELECT DISTINCT(id) FROM nodes_tags
+                    WHERE value='place_of_worship') pow
+                    ON nodes_tags.id = pow.id
+                    WHERE nodes_tags.key='religion'
+                    GROUP BY nodes_tags.value
+                    ORDER BY num DESC
+                    LIMIT 1'''),
+    ('schools', '''SELECT COUNT(*) as NUM
+                   FROM nodes_tags
+                   WHERE nodes_tags.value = 'school' OR
+                   nodes_tags.value = 'college' OR
+                   nodes_tags.value = 'kindergarden' OR
+                   nodes_tags.value = 'university' '''),
+    ('casinos', '''SELECT COUNT(*) as NUM
+                   FROM ways_tags
+                   WHERE ways_tags.value = 'casino' OR
+                   ways_tags.value = 'adult_gaming_centre' OR
+                   ways_tags.value = 'amusement_arcade' OR
+                   ways_tags.value = 'gambling' '''),
+    ('ways_of_node', '''SELECT COUNT(DISTINCT id) FROM ways_nodes
+                        WHERE node_id = 4242'''),
+]
+
+
+def time_queries(conn, queries=QUERIES):
+    results = {}
+    for name, sql in queries:
+        best = None
+        for _ in range(REPEAT):
+            start = time.time()
+            rows = conn.execute(sql).fetchall()
+            elapsed = time.time() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = (best, rows)
+    return results
+
+
+def main():
+    tmp_dir = tempfile.mkdtemp(prefix='bench_queries_')
+    try:
+        if len(sys.argv) > 1:
+            path = sys.argv[1]
+        else:
+            path = osm_fixture.write_osm(os.path.join(tmp_dir, 'bench.osm'), N_NODES)
+        db_path = os.path.join(tmp_dir, 'bench.db')
+
+        start = time.time()
+        SQLload.load_map(path, db_path, index=False)
+        print 'load without indexes %.2f s' % (time.time() - start)
+
+        conn = sqlite3.connect(db_path)
+        before = time_queries(conn)
+
+        start = time.time()
+        SQLload.create_indexes(conn)
+        print 'index + ANALYZE      %.2f s' % (time.time() - start)
+        after = time_queries(conn)
+        conn.close()
+
+        print '%-14s %12s %12s %8s' % ('query', 'scan ms', 'indexed ms', 'speedup')
+        for name, _ in QUERIES:
+            assert before[name][1] == after[name][1], name
+            print '%-14s %12.2f %12.2f %7.0fx' % (
+                name, before[name][0] * 1000, after[name][0] * 1000,
+                before[name][0] / max(after[name][0], 1e-6))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+# Time to cut a 1% test fixture: sample.py's every-k-th element with
+# ET.tostring against VegasSample.py's hash sample copied from the mapped
+# file. Also counts the nd refs and relation members of each sample that
+# point at elements left out of it (VegasSample.py must have none).
+#
+# Usage: python bench_sample.py [osm file]
+# Without a file a synthetic one is generated.
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import xml.etree.cElementTree as ET
+
+import osm_fixture
+import VegasSample
+import VegasStream
+
+N_NODES = 1000000
+FRACTION = 0.01
+
+
+def every_kth(file_in, file_out, k):
+    """sample.py as it was: parse everything, re-serialize every k-th element"""
+    with open(file_out, 'wb') as output:
+        output.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        output.write('<osm>\n  ')
+        for i, element in enumerate(VegasStream.get_element(file_in, backend='etree')):
+            if i % k == 0:
+                output.write(ET.tostring(element, encoding='utf-8'))
+        output.write('</osm>')
+
+
+def dangling(path):
+    """Return (elements, references to elements missing from the file)"""
+    ids = {'node': set(), 'way': set(), 'relation': set()}
+    refs = []
+    for element in VegasStream.get_element(path, backend='etree'):
+        ids[element.tag].add(element.attrib['id'])
+        for child in element:
+            if child.tag == 'nd':
+                refs.append(('node', child.attrib['ref']))
+            elif child.tag == 'member':
+                refs.append((child.attrib['type'], child.attrib['ref']))
+    return (sum(len(found) for found in ids.values()),
+            sum(1 for element_type, ref in refs if ref not in ids[element_type]))
+
+
+def main():
+    tmp_dir = tempfile.mkdtemp(prefix='bench_sample_')
+    try:
+        if len(sys.argv) > 1:
+            path = sys.argv[1]
+        else:
+            path = osm_fixture.write_osm(os.path.join(tmp_dir, 'bench.osm'), N_NODES)
+        print 'input %.1f MB, %.0f%% sample' % (os.path.getsize(path) / 1e6, FRACTION * 100)
+        print '%-24s %8s %10s %10s' % ('sampler', 'seconds', 'elements', 'dangling')
+
+        old_path = os.path.join(tmp_dir, 'every_kth.osm')
+        start = time.time()
+        every_kth(path, old_path, int(1 / FRACTION))
+        elapsed = time.time() - start
+        print '%-24s %8.2f %10d %10d' % (('every k-th + tostring', elapsed) +
+                                         dangling(old_path))
+
+        new_path = os.path.join(tmp_dir, 'hash.osm')
+        start = time.time()
+        VegasSample.sample(path, new_path, fraction=FRACTION)
+        elapsed = time.time() - start
+        elements, missing = dangling(new_path)
+        assert missing == 0
+        print '%-24s %8.2f %10d %10d' % ('VegasSample (raw copy)', elapsed,
+                                         elements, missing)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+# Latency of the SQLspatial.py searches against full scans of nodes: boxes
+# of growing size around the Strip, and "cafes within 1 km of the Strip".
+# Both ways must find the same nodes.
+#
+# Usage: python bench_spatial.py [osm file]
+# Without a file a synthetic one is generated.
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import osm_fixture
+import SQLload
+import SQLspatial
+
+N_NODES = 200000
+REPEAT = 5
+
+# Half widths of the boxes around the Strip, meters
+BOX_SIZES = [100, 1000, 5000, 20000]
+
+
+def best_time(search):
+    best = None
+    for _ in range(REPEAT):
+        start = time.time()
+        result = search()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def scan_bbox(conn, min_lat, min_lon, max_lat, max_lon):
+    return conn.execute('''SELECT id, lat, lon FROM nodes
+                           WHERE lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?
+                           ORDER BY id''',
+                        (min_lat, max_lat, min_lon, max_lon)).fetchall()
+
+
+def scan_within(conn, lat, lon, radius, value):
+    """Every node's distance, then the ones with the tag value"""
+    tagged = set(row[0] for row in conn.execute(
+        'SELECT id FROM nodes_tags WHERE value = ?', (value,)))
+    found = []
+    for node_id, node_lat, node_lon in conn.execute('SELECT id, lat, lon FROM nodes'):
+        d = SQLspatial.distance(lat, lon, node_lat, node_lon)
+        if d <= radius and node_id in tagged:
+            found.append((d, node_id, node_lat, node_lon))
+    found.sort()
+    return found
+
+
+def main():
+    tmp_dir = tempfile.mkdtemp(prefix='bench_spatial_')
+    try:
+        if len(sys.argv) > 1:
+            path = sys.argv[1]
+        else:
+            path = osm_fixture.write_osm(os.path.join(tmp_dir, 'bench.osm'), N_NODES)
+        db_path = os.path.join(tmp_dir, 'bench.db')
+
+        SQLload.load_map(path, db_path, index=False)
+        conn = sqlite3.connect(db_path)
+        SQLload.create_indexes(conn)
+        start = time.time()
+        SQLspatial.create_spatial_index(conn)
+        print 'R*Tree build %.2f s' % (time.time() - start)
+
+        lat, lon = SQLspatial.STRIP
+        print '%-22s %8s %10s %10s %8s' % ('search', 'nodes', 'scan ms',
+                                           'rtree ms', 'speedup')
+        for size in BOX_SIZES:
+            box = SQLspatial.radius_bbox(lat, lon, size)
+            scan, expected = best_time(lambda: scan_bbox(conn, *box))
+            rtree, found = best_time(lambda: SQLspatial.nodes_in_bbox(conn, *box))
+            assert found == expected, size
+            print '%-22s %8d %10.2f %10.2f %7.0fx' % (
+                'bbox +/- %d m' % size, len(found), scan * 1000, rtree * 1000,
+                scan / max(rtree, 1e-6))
+
+        scan, expected = best_time(lambda: scan_within(conn, lat, lon, 1000, 'cafe'))
+        rtree, found = best_time(
+            lambda: SQLspatial.nodes_within(conn, lat, lon, 1000, value='cafe'))
+        assert found == expected
+        print '%-22s %8d %10.2f %10.2f %7.0fx' % (
+            'cafes within 1 km', len(found), scan * 1000, rtree * 1000,
+            scan / max(rtree, 1e-6))
+        conn.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Data Wrangling Project
+By: Kyle Campbell
+"""
+
+# Synthetic OSM files for the benchmarks, so they can run at any size
+# without the full las-vegas_nevada.osm download. The layout follows the
+# metro extract: nodes, then ways referencing those nodes, then relations.
+
+import os
+import random
+import sys
+from xml.sax.saxutils import quoteattr
+
+# Let the benchmarks import the project modules from the parent folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+USERS = ['alice', 'bob', 'carol', 'dave', 'J\xc3\xb6rg']
+CITIES = ['Las Vegas', 'Las Vegas NV', 'Las vegas', 'las vegas', 'LAS VEGAS',
+          'Henderson', 'North Las Vegas']
+STATES = ['NV', 'NV', 'NV', 'nv', 'Nevada']
+STREETS = ['W Flamingo Rd', 'S Las Vegas Blvd', 'E Tropicana Ave.',
+           'Paradise Road', 'Stone Canyon St', 'N Rainbow Blvd',
+           'S Eastern Ave Ste 100', 'Spring Mountain Road']
+AMENITIES = ['cafe', 'coffee_shop', 'school', 'place_of_worship', 'casino',
+             'restaurant', 'fuel', 'university']
+TIMESTAMP = '2017-04-01T12:01:54Z'
+
+WAY_ID_START = 100000000
+RELATION_ID_START = 7000000
+
+
+def _tags(rand):
+    """Return a list of (k, v) pairs in the mix seen in the Vegas extract"""
+    tags = []
+    r = rand.random()
+    if r < 0.25:
+        tags.append(('addr:city', rand.choice(CITIES)))
+        tags.append(('addr:state', rand.choice(STATES)))
+        tags.append(('addr:street', rand.choice(STREETS)))
+    if r > 0.6:
+        tags.append(('amenity', rand.choice(AMENITIES)))
+    if r > 0.85:
+        tags.append(('religion', 'christian'))
+    if r > 0.9:
+        tags.append(('name', 'Caf\xc3\xa9 & Bar'))
+        # Non-ASCII key, so the csv paths must encode keys as well as values
+        tags.append(('name:stra\xc3\x9fe', 'Flamingo Stra\xc3\x9fe'))
+    if r > 0.95:
+        tags.append(('tiger:name_base:1', 'Flamingo'))
+    if r > 0.97:
+        tags.append(('fixme ', 'check'))
+    return tags
+
+
+def _write_tags(out, tags):
+    for k, v in tags:
+        out.write('    <tag k=%s v=%s/>\n' % (quoteattr(k), quoteattr(v)))
+
+
+def _attrs(rand, element_id):
+    uid = rand.randrange(len(USERS))
+    return 'id="%d" version="%d" changeset="%d" user=%s uid="%d" timestamp="%s"' % (
+        element_id, rand.randint(1, 9), rand.randint(1000000, 50000000),
+        quoteattr(USERS[uid]), uid + 1, TIMESTAMP)
+
+
+def write_osm(path, n_nodes, seed=0):
+    """Write a synthetic OSM file with n_nodes nodes, n_nodes/5 ways and
+    n_nodes/50 relations to path"""
+    rand = random.Random(seed)
+    with open(path, 'wb') as out:
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        out.write('<osm version="0.6" generator="osm_fixture">\n')
+        out.write(' <bounds minlat="35.9" minlon="-115.4" maxlat="36.4" maxlon="-114.9"/>\n')
+
+        for i in xrange(1, n_nodes + 1):
+            head = ' <node %s lat="%.7f" lon="%.7f"' % (
+                _attrs(rand, i), 35.9 + rand.random() * 0.5,
+                -115.4 + rand.random() * 0.5)
+            tags = _tags(rand)
+            if tags:
+                out.write(head + '>\n')
+                _write_tags(out, tags)
+                out.write(' </node>\n')
+            else:
+                out.write(head + '/>\n')
+
+        for i in xrange(n_nodes // 5):
+            out.write(' <way %s>\n' % _attrs(rand, WAY_ID_START + i))
+            for _ in xrange(rand.randint(2, 20)):
+                out.write('    <nd ref="%d"/>\n' % rand.randint(1, n_nodes))
+            _write_tags(out, _tags(rand) + [('highway', 'residential')])
+            out.write(' </way>\n')
+
+        for i in xrange(n_nodes // 50):
+            out.write(' <relation %s>\n' % _attrs(rand, RELATION_ID_START + i))
+            for _ in xrange(rand.randint(1, 10)):
+                if rand.random() < 0.7:
+                    out.write('    <member type="way" ref="%d" role="outer"/>\n'
+                              % (WAY_ID_START + rand.randrange(max(1, n_nodes // 5))))
+                else:
+                    out.write('    <member type="node" ref="%d" role=""/>\n'
+                              % rand.randint(1, n_nodes))
+            _write_tags(out, [('type', 'multipolygon')])
+            out.write(' </relation>\n')
+
+        out.write('</osm>\n')
+    return path
+
+
+if __name__ == '__main__':
+    write_osm(sys.argv[1], int(sys.argv[2]))
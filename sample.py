@@ -7,33 +7,45 @@ By: Kyle Campbell
 """
 
 import xml.etree.ElementTree as ET  # Use cElementTree or lxml if too slow
+from VegasStream import element_spans, get_element, open_mapped, root_span
 
 OSM_FILE = "las-vegas_nevada.osm"  # Replace this with your osm file
 SAMPLE_FILE = "sample.osm"
 
 k = 20 # Parameter: take every k-th top level element
 
-def get_element(osm_file, tags=('node', 'way', 'relation')):
-    """Yield element if it is the right type of tag
-
-    Reference:
-    http://stackoverflow.com/questions/3095434/inserting-newlines-in-xml-file-generated-via-xml-etree-elementtree-in-python
-    """
-    context = iter(ET.iterparse(osm_file, events=('start', 'end')))
-    _, root = next(context)
-    for event, elem in context:
-        if event == 'end' and elem.tag in tags:
-            yield elem
-            root.clear()
-
-
-with open(SAMPLE_FILE, 'wb') as output:
-    output.write('<?xml version="1.0" encoding="UTF-8"?>\n')
-    output.write('<osm>\n  ')
-
-    # Write every kth top level element
-    for i, element in enumerate(get_element(OSM_FILE)):
-        if i % k == 0:
-            output.write(ET.tostring(element, encoding='utf-8'))
-
-    output.write('</osm>')
\ No newline at end of file
+# Copy each element's bytes straight out of the memory-mapped file instead
+# of parsing it and writing it back with ET.tostring. The output keeps the
+# original formatting; set to False for the re-serialized sample.
+RAW = True
+
+if RAW:
+    data = open_mapped(OSM_FILE)
+    try:
+        with open(SAMPLE_FILE, 'wb') as output:
+            # The original <?xml ...?> and <osm ...> start tag
+            output.write(data[:root_span(data)[1]])
+            output.write(b'\n')
+
+            # Write every kth top level element
+            for i, (tag, start, end) in enumerate(element_spans(data)):
+                if i % k == 0:
+                    output.write(b'  ')
+                    output.write(data[start:end])
+                    output.write(b'\n')
+
+            output.write(b'</osm>\n')
+    finally:
+        data.close()
+else:
+    with open(SAMPLE_FILE, 'wb') as output:
+        output.write(b'<?xml version="1.0" encoding="UTF-8"?>\n')
+        output.write(b'<osm>\n  ')
+
+        # Write every kth top level element
+        # ET.tostring needs real ElementTree elements, not lxml/expat ones
+        for i, element in enumerate(get_element(OSM_FILE, backend='etree')):
+            if i % k == 0:
+                output.write(ET.tostring(element, encoding='utf-8'))
+
+        output.write(b'</osm>')